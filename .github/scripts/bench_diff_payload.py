@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Benchmark build_diff_payload.py against a generated repository.
+
+Generates a git repository with thousands of .mdx pages in two commits: the
+first adds every page, the second is a refactor that edits, renames, deletes
+and adds pages. Then it collects the payload for both diffs, as a first push
+(against EMPTY_TREE_SHA) and as an ordinary push, and reports the best wall
+time of each next to the old approach of one ``git show`` per whole file,
+plus how much smaller sending changed sections and moves makes modified
+and renamed pages, and how many compressed payload parts the diff streams
+into. Both approaches must agree on which files changed.
+
+Usage:
+    python3 .github/scripts/bench_diff_payload.py
+    python3 .github/scripts/bench_diff_payload.py --files 5000 --repeat 5
+    python3 .github/scripts/bench_diff_payload.py --workdir /tmp/diff-bench --json bench.json
+
+The repository is a pure function of --files and --seed, so runs on two
+branches are comparable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import build_diff_payload as payload
+
+WORDS = (
+    "graph node edge query index cypher vector property label path match return "
+    "cluster replica memory latency shard schema traversal client driver module"
+).split()
+SECTIONS = 40
+# Shares of the first commit's pages the refactor edits, renames and deletes.
+EDITED, RENAMED, DELETED = 0.3, 0.1, 0.05
+
+
+def log(message: str) -> None:
+    print(message, flush=True)
+
+
+def git(repo: Path, *args: str) -> None:
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+
+def commit(repo: Path, message: str) -> str:
+    git(repo, "add", "--all")
+    git(repo, "-c", "user.name=bench", "-c", "user.email=bench@example.com",
+        "commit", "--quiet", "--message", message)
+    return subprocess.run(
+        ["git", "-C", str(repo), "rev-parse", "HEAD"],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+
+
+def page(rng: random.Random, title: str) -> str:
+    body = []
+    for n in range(rng.randint(2, 6)):
+        body.append(f"## Section {n}\n")
+        body.append(" ".join(rng.choices(WORDS, k=rng.randint(40, 160))) + "\n")
+    return f"---\ntitle: {title}\n---\n\n" + "\n".join(body)
+
+
+def generate(repo: Path, files: int, seed: int) -> tuple[str, str]:
+    """Create the repository; returns the SHAs of its two commits."""
+    rng = random.Random(seed)
+    git(repo.parent, "init", "--quiet", "-b", "main", repo.name)
+    paths = [f"section-{i % SECTIONS:02d}/page-{i:05d}.mdx" for i in range(files)]
+    for path in paths:
+        (repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / path).write_text(page(rng, path), encoding="utf-8")
+    (repo / "docs.json").write_text("{}\n", encoding="utf-8")
+    first = commit(repo, "add pages")
+
+    rng.shuffle(paths)
+    renamed = int(files * RENAMED)
+    deleted = renamed + int(files * DELETED)
+    edited = deleted + int(files * EDITED)
+    for n, path in enumerate(paths[:renamed]):
+        os.rename(repo / path, repo / path.replace("page-", "moved-"))
+        if n % 3 == 0:  # a restructure that also edits the page
+            with open(repo / path.replace("page-", "moved-"), "a", encoding="utf-8") as f:
+                f.write("\nSee also " + " ".join(rng.choices(WORDS, k=8)) + "\n")
+    for path in paths[renamed:deleted]:
+        os.unlink(repo / path)
+    for path in paths[deleted:edited]:
+        with open(repo / path, "a", encoding="utf-8") as f:
+            f.write("\nOne more paragraph about " + " ".join(rng.choices(WORDS, k=12)) + "\n")
+    for i in range(files // 20):
+        (repo / f"new/page-{i:05d}.mdx").parent.mkdir(exist_ok=True)
+        (repo / f"new/page-{i:05d}.mdx").write_text(page(rng, f"new {i}"), encoding="utf-8")
+    return first, commit(repo, "refactor pages")
+
+
+def collect(diff: str, base: str, head: str) -> tuple[dict, dict, list, list, list]:
+    """Every change the payload streams, gathered into in-memory buckets.
+
+    Returns ``(added, modified, moved, deleted, unchanged)``.
+    """
+    added, modified, moved, deleted, unchanged = {}, {}, [], [], []
+    for bucket, path, entry in payload._iter_md_changes(diff, base, head, unchanged):
+        if bucket == "added":
+            added[path] = entry
+        elif bucket == "modified":
+            modified[path] = entry
+        elif bucket == "moved":
+            moved.append(entry)
+        else:
+            deleted.append(entry)
+    return added, modified, moved, deleted, unchanged
+
+
+def collect_with_show(diff: str, head: str) -> tuple[dict, dict, list]:
+    """The payload as collected before, with one ``git show`` per file."""
+    def read(path: str) -> str | None:
+        proc = subprocess.run(
+            ["git", "show", f"{head}:{path}"], capture_output=True, text=True, check=False
+        )
+        return proc.stdout if proc.returncode == 0 else None
+
+    added, modified, deleted = {}, {}, []
+    for line in diff.splitlines():
+        parts = line.split("\t")
+        status = parts[0][0]
+        if status == "R":
+            if parts[1].endswith(".mdx"):
+                deleted.append(parts[1])
+            if parts[2].endswith(".mdx") and (content := read(parts[2])) is not None:
+                added[parts[2]] = content
+        elif parts[1].endswith(".mdx"):
+            if status == "D":
+                deleted.append(parts[1])
+            elif (content := read(parts[1])) is not None:
+                (added if status == "A" else modified)[parts[1]] = content
+    return added, modified, deleted
+
+
+def best(function, repeat: int) -> tuple[float, object]:
+    seconds, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        seconds = min(seconds, time.perf_counter() - started)
+    return seconds, result
+
+
+def run(repo: Path, args: argparse.Namespace) -> dict:
+    first, second = generate(repo, args.files, args.seed)
+    os.chdir(repo)  # build_diff_payload runs git in the current directory
+    with payload._BlobReader() as blobs:
+        if blobs.read(second, "no/such/page.mdx") is not None:
+            sys.exit("error: a path missing at head was not skipped")
+
+    results = {}
+    for name, base, head in (
+        ("first push", payload.EMPTY_TREE_SHA, first),
+        ("refactor", first, second),
+    ):
+        diff = payload._git_diff_name_status(base, head)
+        batch, collected = best(
+            lambda: collect(diff, base, head), args.repeat
+        )
+        show, expected = best(lambda: collect_with_show(diff, head), args.show_repeat)
+        # Modified pages carry their changed sections instead of whole files,
+        # and renames are moves rather than a delete plus an add.
+        added, modified, moved, deleted, unchanged = collected
+        if (
+            any(expected[0][path] != content for path, content in added.items())
+            or set(expected[0]) != set(added) | {move["to"] for move in moved}
+            or set(expected[1]) != set(modified) | set(unchanged)
+            or sorted(expected[2]) != sorted(deleted + [move["from"] for move in moved])
+        ):
+            sys.exit(f"error: {name}: cat-file and git show payloads differ")
+        whole = len(json.dumps(expected[1])) + sum(
+            len(json.dumps(expected[0][move["to"]])) for move in moved
+        )
+        sections = len(json.dumps(modified)) + len(json.dumps(moved))
+        parts = payload._PartWriter(repo.parent / "payload", "bench", args.part_bytes)
+        for bucket, path, entry in payload._iter_md_changes(diff, base, head, []):
+            parts.add(bucket, path, entry)
+        parts.close(base, head)
+        compressed = sum(part["bytes"] for part in parts.parts)
+        added, modified, moved, deleted, _ = (len(bucket) for bucket in collected)
+        log(f"{name}: +{added} ~{modified} >{moved} -{deleted}")
+        log(f"  cat-file --batch {batch:9.3f}s")
+        log(f"  git show         {show:9.3f}s  ({show / batch:.1f}x)")
+        log(f"  changed bytes    {sections:>9} as sections and moves, {whole} as whole files")
+        log(f"  payload parts    {len(parts.parts):>9} of at most {args.part_bytes} bytes, "
+            f"{compressed} compressed")
+        results[name] = {
+            "added": added, "modified": modified, "moved": moved, "deleted": deleted,
+            "cat_file_seconds": round(batch, 4), "git_show_seconds": round(show, 4),
+            "changed_bytes": sections, "changed_whole_file_bytes": whole,
+            "parts": len(parts.parts), "compressed_bytes": compressed,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--files", type=int, default=3000, help=".mdx pages in the first commit")
+    parser.add_argument("--repeat", type=int, default=3, help="take the best of this many runs")
+    parser.add_argument(
+        "--show-repeat", type=int, default=1, help="runs of the slow git show approach"
+    )
+    parser.add_argument(
+        "--part-bytes", type=int, default=payload.PART_BYTES, help="compressed payload part limit"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workdir", type=Path, help="generate the repository here instead of a temporary one"
+    )
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args()
+    if args.json:
+        args.json = Path(args.json).resolve()
+
+    with tempfile.TemporaryDirectory(prefix="bench-diff-payload-") as tmp:
+        workdir = args.workdir.resolve() if args.workdir else Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        cwd = os.getcwd()
+        try:
+            results = run(workdir / "repo", args)
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        log(f"results: wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
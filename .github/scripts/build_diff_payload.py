@@ -2,23 +2,164 @@
 
 Invoked from .github/workflows/update-graph.yml after a push to main:
 reads BASE_SHA + HEAD_SHA from env, computes the .mdx diff, reads file
-content for added+modified entries, and writes payload.json. Sets the
-``skip`` step output to ``true`` when nothing ingestable changed so the
-workflow can short-circuit before the network call.
+content for added entries and the changed sections of modified ones,
+and writes them to ``payload/`` in compressed parts. Sets the ``skip``
+step output to ``true`` when nothing ingestable changed so the workflow
+can short-circuit before the network call.
+
+The diff starts from the last commit the graph was updated to, kept in
+the ``refs/graph-ingested/<GRAPH_ID>`` ref on origin, rather than from the
+push's own ``before``, and runs up to the tip of TIP_REF when that is
+ahead of HEAD_SHA. A burst of pushes queued behind one run is therefore
+ingested by the first of them, and the rest find their range covered and
+do nothing. If history was rewritten so that the marker is no longer on
+it, the diff still starts from the marker, since that is what the graph
+holds. The ``marker`` output names the commit to record once the
+update succeeds, which the workflow does with ``--mark``::
+
+    python3 .github/scripts/build_diff_payload.py --mark <sha>
+
+Payload (``version`` 2), one per part::
+
+    {
+      "version": 2,
+      "graph_id": "...",
+      "part": 1,
+      "files": {
+        "added":    {path: content},
+        "modified": {path: {"added":   [section, ...],
+                            "changed": [section, ...],
+                            "removed": [{"id": ..., "hash": ...}, ...]}},
+        "moved":    [{"from": old, "to": new, "similarity": 0-100,
+                      "sections": {...}}, ...],
+        "deleted":  [path, ...]
+      }
+    }
+
+A modified page is split into heading-delimited sections at both ends of
+the diff (see ``_split_sections``), and only the sections that differ
+are sent, each as ``{"id", "heading", "hash", "content"}``, so ingesting
+a one-word fix costs one section rather than the whole page. A renamed
+page is a move: the graph can relabel what it already extracted, and
+``sections`` (the same shape as a modified page) is only present when
+git's similarity score is below 100 and some section actually differs.
+
+Sections are compared by what the ingester would extract from them (see
+``_normalise``): a page whose edits only rewrap lines, touch front matter
+outside ``_FRONT_MATTER_KEYS`` or respell links to the same target is
+dropped, and listed in the step summary instead.
+
+The payload is never held in memory whole. Files are read one at a time
+and streamed into ``payload/part-NNNN.json.gz``, each a gzip-compressed
+payload of at most PAYLOAD_PART_BYTES (4 MiB by default), so every
+request stays small enough to retry on its own. ``payload/manifest.json``
+lists the parts in the order they must be applied, with their sizes and
+per-bucket file counts: entries are streamed in ``_BUCKET_ORDER``, so all
+deletes land in the earliest parts and all adds in the last ones.
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
 import json
 import os
 import pathlib
+import re
 import subprocess
 import sys
+import zlib
+from collections.abc import Iterator
+
+# Pages are split with the document model the docs scripts share.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2] / "scripts"))
+from mdx_document import heading_slug, parse
 
 # git's well-known empty-tree SHA — used as the "before" when a push
 # carries an all-zero ``before`` (i.e., first push to a brand-new branch).
 EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
 
+PAYLOAD_VERSION = 2
+
+# The payload is written to PAYLOAD_DIR as a manifest and the parts it
+# lists, each at most PAYLOAD_PART_BYTES (env) compressed.
+PAYLOAD_DIR = "payload"
+PART_BYTES = 4 * 1024 * 1024
+_PART_NAME = "part-{:04d}.json.gz"
+_PART_GLOB = "part-*.json.gz"
+_MANIFEST_NAME = "manifest.json"
+# Room kept in every part for the text that closes it and the gzip trailer.
+_PART_RESERVE = 128
+# The order buckets are applied in: deletes before anything that could
+# add a page at the same path.
+_BUCKET_ORDER = ("deleted", "moved", "modified", "added")
+# Buckets that are objects keyed by path rather than lists.
+_KEYED_BUCKETS = frozenset({"modified", "added"})
+
+# Where the last successfully ingested commit of each graph is recorded.
+_MARKER_PREFIX = "refs/graph-ingested/"
+
+# Front matter keys whose values end up in the graph; the rest (sidebar
+# titles, icons, modes...) only affect how the site renders a page.
+_FRONT_MATTER_KEYS = frozenset({"title", "description", "keywords"})
+# A link target: markdown ``](target``, or an ``href``/``src`` attribute.
+_LINK_RE = re.compile(r"""(\]\(|\b(?:href|src)=["'])([^\s"')]+)""")
+# Absolute links into this site, which mean the same as root-relative ones.
+_SITE_ORIGIN_RE = re.compile(r"^https?://docs\.falkordb\.com(?=/|$)")
+
+
+def _rev_parse(rev: str) -> str | None:
+    """Return the commit ``rev`` names, or None if it doesn't name one."""
+    proc = subprocess.run(
+        ["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"],
+        capture_output=True, text=True, check=False,
+    )
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def _is_ancestor(ancestor: str, descendant: str) -> bool:
+    return subprocess.run(
+        ["git", "merge-base", "--is-ancestor", ancestor, descendant],
+        capture_output=True, check=False,
+    ).returncode == 0
+
+
+def _read_marker(graph_id: str) -> str | None:
+    """Fetch the last-ingested marker from origin and return its commit.
+
+    None when there is no marker yet. A failed fetch is reported and
+    treated the same way, which falls back to diffing the push alone.
+    """
+    ref = _MARKER_PREFIX + graph_id
+    proc = subprocess.run(
+        ["git", "fetch", "--quiet", "--no-tags", "origin", f"+{ref}:{ref}"],
+        capture_output=True, text=True, check=False,
+    )
+    if proc.returncode != 0:
+        if "couldn't find remote ref" not in proc.stderr:
+            print(f"::warning::Could not fetch {ref}: {proc.stderr.strip()}", file=sys.stderr)
+        return None
+    return _rev_parse(ref)
+
+
+def _write_marker(graph_id: str, sha: str) -> bool:
+    """Record ``sha`` as ingested; False if the marker is already past it.
+
+    The marker moves forward along history with a plain push. When history
+    was rewritten under it, so that it is neither behind nor ahead of
+    ``sha``, the push is forced, but only over the marker just read:
+    ``--force-with-lease`` still refuses if another run moved it since.
+    """
+    ref = _MARKER_PREFIX + graph_id
+    marker = _read_marker(graph_id)
+    if marker and marker != sha and _is_ancestor(sha, marker):
+        return False
+    push = ["git", "push", "--quiet", "origin", f"{sha}:{ref}"]
+    if marker and not _is_ancestor(marker, sha):
+        push.insert(2, f"--force-with-lease={ref}:{marker}")
+    subprocess.run(push, check=True)
+    return True
+
 
 def _git_diff_name_status(base: str, head: str) -> str:
     """Return the raw ``git diff --name-status`` output between two SHAs."""
@@ -28,40 +169,161 @@ def _git_diff_name_status(base: str, head: str) -> str:
     ).stdout
 
 
-def _read_at(head: str, path: str) -> str | None:
-    """Read a file's content at a specific commit, regardless of what's
-    currently checked out in the working tree.
+class _BlobReader:
+    """Read files at a specific commit through one ``git cat-file --batch``.
 
-    Uses ``git show <head>:<path>``, which pulls the blob from the
-    object store. Reading from disk via ``pathlib`` would only work if
-    the runner had already checked out ``head``; this is more robust
-    and lets the script be exercised locally against historical
-    commits without checking them out first. Returns None if the path
-    doesn't exist at ``head`` (e.g. rare rename edge cases).
+    Content comes from the object store, not the working tree, so the
+    script works against historical commits without checking them out.
+    A single long-lived process answers every lookup: on a first push
+    (diffed against ``EMPTY_TREE_SHA``) or a large refactor, that is one
+    process launch instead of one ``git show`` per file.
     """
-    proc = subprocess.run(
-        ["git", "show", f"{head}:{path}"],
-        capture_output=True, text=True, check=False,
-    )
-    if proc.returncode != 0:
+
+    def __init__(self) -> None:
+        self._proc = subprocess.Popen(
+            ["git", "cat-file", "--batch=%(objectname) %(objecttype) %(objectsize)"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def __enter__(self) -> _BlobReader:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._proc.stdin.close()
+        self._proc.stdout.close()
+        self._proc.wait()
+
+    def read(self, commit: str, path: str) -> str | None:
+        """Return the file's content at ``commit``, or None if the path
+        doesn't exist there (e.g. rare rename edge cases)."""
+        self._proc.stdin.write(f"{commit}:{path}\n".encode("utf-8"))
+        self._proc.stdin.flush()
+        # "<sha> <type> <size>" then the content and a newline, or
+        # "<name> missing" / "<name> ambiguous" with nothing after it. The
+        # name is the path asked for, which may itself contain spaces.
+        line = self._proc.stdout.readline().rstrip(b"\n")
+        if line.endswith((b" missing", b" ambiguous")):
+            return None
+        _, kind, size = line.split(b" ")
+        content = self._proc.stdout.read(int(size) + 1)[:-1]
+        if kind != b"blob":
+            return None
+        # Same text as ``git show`` read with text=True gave: UTF-8 with
+        # universal newlines.
+        text = content.decode("utf-8")
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _split_sections(content: str) -> list[tuple[str, str, str]]:
+    """Split a page into ``(id, heading, text)`` sections.
+
+    Sections are ``Document.sections()``: each runs from a heading to
+    the next heading of any level, headings in front matter and code
+    blocks don't count, and whatever precedes the first one is the
+    section with id ``""``. Ids are the anchors of the heading and of
+    the headings it is nested under, joined by ``/``, with ``-2``,
+    ``-3``... on repeats, so they stay put when other sections change.
+    """
+    sections: list[tuple[str, str, str]] = []
+    parents: list[tuple[int, str]] = []
+    seen: dict[str, int] = {}
+    for level, heading, text in parse(content).sections():
+        if not level:
+            sections.append(("", "", text))
+            continue
+        while parents and parents[-1][0] >= level:
+            parents.pop()
+        parents.append((level, heading_slug(heading) or "section"))
+        section_id = "/".join(slug for _, slug in parents)
+        seen[section_id] = seen.get(section_id, 0) + 1
+        if seen[section_id] > 1:
+            section_id += f"-{seen[section_id]}"
+        sections.append((section_id, heading, text))
+    return sections
+
+
+def _canonical_link(target: str) -> str:
+    """A link target with the spelling differences of equal links removed:
+    this site's origin, ``.md``/``.mdx``/``.html`` suffixes, a trailing
+    ``/index`` and a trailing slash."""
+    path, hash_, fragment = target.partition("#")
+    rooted = path.startswith("/") or bool(_SITE_ORIGIN_RE.match(path))
+    path = re.sub(r"\.(?:mdx?|html)$", "", _SITE_ORIGIN_RE.sub("", path))
+    path = re.sub(r"(?:^|/)index$", "", path).rstrip("/")
+    return (path or ("/" if rooted else "")) + hash_ + fragment
+
+
+def _normalise(text: str) -> str:
+    """A page (or section) reduced to what the ingester extracts from it:
+    front matter limited to ``_FRONT_MATTER_KEYS``, canonical link
+    targets, and whitespace collapsed to single spaces."""
+    front_matter = parse(text).front_matter
+    if front_matter:
+        kept, keep = [], False
+        for line in front_matter.splitlines()[1:-1]:  # between the --- lines
+            if line and not line[0].isspace():  # a top-level key, not a continuation
+                keep = line.split(":", 1)[0].strip() in _FRONT_MATTER_KEYS
+            if keep:
+                kept.append(line)
+        text = "\n".join(kept) + "\n" + text[len(front_matter):]
+    text = _LINK_RE.sub(lambda m: m.group(1) + _canonical_link(m.group(2)), text)
+    return " ".join(text.split())
+
+
+def _section_hash(text: str) -> str:
+    """A stable hash of what a section says (see ``_normalise``)."""
+    return hashlib.sha256(_normalise(text).encode("utf-8")).hexdigest()[:16]
+
+
+def _section_changes(old: str, new: str) -> dict[str, list[dict]] | None:
+    """The sections added, changed and removed between two versions of a
+    page, in page order, or None if every section hashes the same."""
+    before = {
+        section_id: _section_hash(text) for section_id, _, text in _split_sections(old)
+    }
+    after = _split_sections(new)
+    added: list[dict] = []
+    changed: list[dict] = []
+    for section_id, heading, text in after:
+        digest = _section_hash(text)
+        if before.get(section_id) == digest:
+            continue
+        section = {"id": section_id, "heading": heading, "hash": digest, "content": text}
+        (changed if section_id in before else added).append(section)
+    current = {section_id for section_id, _, _ in after}
+    removed = [
+        {"id": section_id, "hash": digest}
+        for section_id, digest in before.items()
+        if section_id not in current
+    ]
+    if not (added or changed or removed):
         return None
-    return proc.stdout
+    return {"added": added, "changed": changed, "removed": removed}
 
 
-def _collect_md_changes(
-    diff_output: str, head: str,
-) -> tuple[dict[str, str], dict[str, str], list[str]]:
-    """Parse ``git diff --name-status`` and bucket .mdx changes.
+def _iter_md_changes(
+    diff_output: str, base: str, head: str, unchanged: list[str],
+) -> Iterator[tuple[str, str, object]]:
+    """Parse ``git diff --name-status`` and yield each .mdx change.
 
-    Renames (``R``) are split into delete-old + add-new so the SDK
-    re-extracts the content under the new path. Non-.mdx files are
-    skipped. File content for added/modified entries is read from
-    the git object store at ``head``, not from disk.
+    Yields ``(bucket, path, entry)`` in the order the graph must apply
+    them: every delete, then moves, modified pages and added ones, so a
+    page can't be added before the page it replaces is gone. Renames
+    (``R``) between two .mdx paths become moves; a rename into or out of
+    .mdx is an add or a delete. Non-.mdx files are skipped.
+
+    The name-status lines are bucketed first, which holds paths only.
+    File content is then read one file at a time from the git object
+    store, not from disk, through a single ``_BlobReader``: whole files
+    at ``head`` for added entries, and both ends of the diff for
+    modified and edited moved ones, which are reduced to their changed
+    sections (see ``_section_changes``). Modified pages without any are
+    appended to ``unchanged`` instead of being yielded.
     """
-    added: dict[str, str] = {}
-    modified: dict[str, str] = {}
+    added: list[str] = []
+    modified: list[str] = []
+    moved: list[tuple[str, str, int]] = []
     deleted: list[str] = []
-
     for line in diff_output.splitlines():
         parts = line.split("\t")
         if not parts:
@@ -70,29 +332,155 @@ def _collect_md_changes(
 
         if status == "R" and len(parts) >= 3:
             old, new = parts[1], parts[2]
+            if old.endswith(".mdx") and new.endswith(".mdx"):
+                moved.append((old, new, int(parts[0][1:] or 100)))
+                continue
             if old.endswith(".mdx"):
                 deleted.append(old)
             if new.endswith(".mdx"):
-                content = _read_at(head, new)
-                if content is not None:
-                    added[new] = content
+                added.append(new)
             continue
 
         if len(parts) < 2 or not parts[1].endswith(".mdx"):
             continue
-        path = parts[1]
-        if status == "A":
-            content = _read_at(head, path)
-            if content is not None:
-                added[path] = content
-        elif status == "M":
-            content = _read_at(head, path)
+        {"A": added, "M": modified, "D": deleted}.get(status, []).append(parts[1])
+
+    for path in deleted:
+        yield "deleted", path, path
+    with _BlobReader() as blobs:
+        for old, new, similarity in moved:
+            move = {"from": old, "to": new, "similarity": similarity}
+            if similarity < 100:
+                content = blobs.read(head, new)
+                if content is None:
+                    yield "deleted", old, old
+                    continue
+                sections = _section_changes(blobs.read(base, old) or "", content)
+                if sections is not None:
+                    move["sections"] = sections
+            yield "moved", new, move
+        for path in modified:
+            content = blobs.read(head, path)
+            if content is None:
+                continue
+            sections = _section_changes(blobs.read(base, path) or "", content)
+            if sections is not None:
+                yield "modified", path, sections
+            else:
+                unchanged.append(path)
+        for path in added:
+            content = blobs.read(head, path)
             if content is not None:
-                modified[path] = content
-        elif status == "D":
-            deleted.append(path)
+                yield "added", path, content
+
+
+class _PartWriter:
+    """Stream payload entries into gzip-compressed parts of bounded size.
+
+    Each part is a complete payload on its own (every bucket present,
+    most of them empty), compressed as it is written, so memory holds
+    one entry at a time rather than the whole diff. An entry that would
+    push the part past ``limit`` compressed bytes starts the next part;
+    so does one whose bucket the part has already closed, which keeps
+    the apply order across parts. An entry too large for any part goes
+    into one of its own, with a warning.
 
-    return added, modified, deleted
+    ``close`` writes the manifest listing the parts in the order they
+    must be applied.
+    """
+
+    def __init__(self, directory: pathlib.Path, graph_id: str, limit: int) -> None:
+        self._dir = directory
+        self._dir.mkdir(parents=True, exist_ok=True)
+        for stale in self._dir.glob(_PART_GLOB):
+            stale.unlink()
+        self._graph_id = graph_id
+        self._limit = limit
+        self.parts: list[dict] = []
+        self._file = None
+
+    def _open(self) -> None:
+        name = _PART_NAME.format(len(self.parts) + 1)
+        self._file = open(self._dir / name, "wb")
+        # wbits 31: a gzip container around the deflate stream.
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 31)
+        self._part = {"file": name, "bytes": 0, "files": {}}
+        self._bucket: str | None = None
+        self._closed: set[str] = set()
+        head = {"version": PAYLOAD_VERSION, "graph_id": self._graph_id}
+        self._write(json.dumps({**head, "part": len(self.parts) + 1})[:-1] + ', "files": {')
+
+    def _write(self, text: str, mode: int = zlib.Z_SYNC_FLUSH) -> None:
+        data = self._compressor.compress(text.encode("utf-8")) + self._compressor.flush(mode)
+        self._file.write(data)
+        self._part["bytes"] += len(data)
+
+    def _entry(self, bucket: str, path: str, entry: object) -> str:
+        """The JSON text that appends ``entry`` to ``bucket`` in this part."""
+        text = json.dumps(entry)
+        if bucket in _KEYED_BUCKETS:
+            text = f"{json.dumps(path)}: {text}"
+        if bucket == self._bucket:
+            return ", " + text
+        opening = "{" if bucket in _KEYED_BUCKETS else "["
+        return f"{self._closing()}{json.dumps(bucket)}: {opening}{text}"
+
+    def _closing(self) -> str:
+        """The JSON text that closes the open bucket, if any."""
+        if self._bucket is None:
+            return ""
+        return ("}" if self._bucket in _KEYED_BUCKETS else "]") + ", "
+
+    def add(self, bucket: str, path: str, entry: object) -> None:
+        if self._file is not None and bucket != self._bucket and bucket in self._closed:
+            self._finish()
+        if self._file is None:
+            self._open()
+        text = self._entry(bucket, path, entry).encode("utf-8")
+        # Compress on a copy first: if the entry doesn't fit, the part is
+        # finished without it and the entry opens the next one.
+        trial = self._compressor.copy()
+        data = trial.compress(text) + trial.flush(zlib.Z_SYNC_FLUSH)
+        if self._part["files"] and self._part["bytes"] + len(data) + _PART_RESERVE > self._limit:
+            self._finish()
+            self._open()
+            text = self._entry(bucket, path, entry).encode("utf-8")
+            trial = self._compressor.copy()
+            data = trial.compress(text) + trial.flush(zlib.Z_SYNC_FLUSH)
+        if self._part["bytes"] + len(data) + _PART_RESERVE > self._limit:
+            print(f"::warning::{path} alone exceeds the {self._limit}-byte part limit")
+        self._compressor = trial
+        self._file.write(data)
+        self._part["bytes"] += len(data)
+        self._part["files"][bucket] = self._part["files"].get(bucket, 0) + 1
+        if bucket != self._bucket and self._bucket is not None:
+            self._closed.add(self._bucket)
+        self._bucket = bucket
+
+    def _finish(self) -> None:
+        """Close the open buckets, add the empty ones and end the part."""
+        text = self._closing()[:-2] if self._bucket else ""
+        for bucket in _BUCKET_ORDER:
+            if bucket not in self._part["files"]:
+                empty = "{}" if bucket in _KEYED_BUCKETS else "[]"
+                text += f"{', ' if text else ''}{json.dumps(bucket)}: {empty}"
+        self._write(text + "}}", zlib.Z_FINISH)
+        self._file.close()
+        self._file = None
+        self.parts.append(self._part)
+
+    def close(self, base: str, head: str) -> None:
+        """Finish the last part and write the manifest."""
+        if self._file is not None:
+            self._finish()
+        manifest = {
+            "version": PAYLOAD_VERSION,
+            "graph_id": self._graph_id,
+            "base": base,
+            "head": head,
+            "parts": self.parts,
+        }
+        (self._dir / _MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n")
 
 
 def _set_output(name: str, value: str) -> None:
@@ -104,26 +492,89 @@ def _set_output(name: str, value: str) -> None:
         f.write(f"{name}={value}\n")
 
 
+def _write_summary(unchanged: list[str]) -> None:
+    """List the modified pages left out as unchanged in the step summary."""
+    out = os.environ.get("GITHUB_STEP_SUMMARY")
+    if not out or not unchanged:
+        return
+    with open(out, "a", encoding="utf-8") as f:
+        f.write(f"### {len(unchanged)} modified pages with no change to ingest\n\n")
+        f.write("Only whitespace, front matter outside the allowlist or link spelling "
+                "changed:\n\n")
+        f.writelines(f"- `{path}`\n" for path in unchanged)
+
+
 def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--mark", metavar="SHA", help="record SHA as ingested instead of building a payload",
+    )
+    args = parser.parse_args()
+    graph_id = os.environ.get("GRAPH_ID", "docs_benchmark")
+    if args.mark:
+        if _write_marker(graph_id, args.mark):
+            print(f"::notice::Marked {args.mark[:7]} as ingested into {graph_id}")
+        else:
+            print(f"::notice::{graph_id} is already marked past {args.mark[:7]}")
+        return 0
+
     base = os.environ["BASE_SHA"]
     head = os.environ["HEAD_SHA"]
-    if set(base) == {"0"}:
+    tip = _rev_parse(os.environ["TIP_REF"]) if os.environ.get("TIP_REF") else None
+    if tip and tip != head and _is_ancestor(head, tip):
+        print(f"::notice::Catching up to {tip[:7]}, pushed after {head[:7]}")
+        head = tip
+
+    marker = _read_marker(graph_id)
+    if marker and _is_ancestor(head, marker):
+        print(f"::notice::Already ingested up to {marker[:7]} — nothing to do.", file=sys.stderr)
+        _set_output("skip", "true")
+        return 0
+    if marker:
+        # The graph holds the marker's content whether or not history still
+        # leads from it to head (after a force-push, say), and git diff
+        # works between any two commits.
+        base = marker
+        if _is_ancestor(marker, head):
+            print(f"::notice::Diffing from {marker[:7]}, the last ingested commit")
+        else:
+            print(f"::notice::Diffing from {marker[:7]}, the last ingested commit, which is "
+                  f"no longer in the history of {head[:7]}")
+    elif set(base) == {"0"}:
         base = EMPTY_TREE_SHA
+    # Every exit from here on covers base..head, so it can be recorded.
+    _set_output("marker", head)
 
     diff = _git_diff_name_status(base, head)
-    added, modified, deleted = _collect_md_changes(diff, head)
+    limit = int(os.environ.get("PAYLOAD_PART_BYTES") or PART_BYTES)
+    unchanged: list[str] = []
+    sections = 0
+    parts = _PartWriter(pathlib.Path(PAYLOAD_DIR), graph_id, limit)
+    for bucket, path, entry in _iter_md_changes(diff, base, head, unchanged):
+        parts.add(bucket, path, entry)
+        if bucket == "moved":
+            entry = entry.get("sections", {})
+        if bucket in ("modified", "moved"):
+            sections += sum(len(changes) for changes in entry.values())
+    parts.close(base, head)
+    _write_summary(unchanged)
+    if unchanged:
+        print(f"::notice::Dropped {len(unchanged)} modified files with no semantic change")
 
-    if not (added or modified or deleted):
-        print("::notice::No .mdx changes — skipping graph update.", file=sys.stderr)
+    if not parts.parts:
+        print("::notice::No .mdx changes to ingest — skipping graph update.", file=sys.stderr)
         _set_output("skip", "true")
         return 0
 
-    payload = {
-        "graph_id": os.environ.get("GRAPH_ID", "docs_benchmark"),
-        "files": {"added": added, "modified": modified, "deleted": deleted},
-    }
-    pathlib.Path("payload.json").write_text(json.dumps(payload), encoding="utf-8")
-    print(f"::notice::Diff: +{len(added)} ~{len(modified)} -{len(deleted)} files")
+    counts = {bucket: 0 for bucket in _BUCKET_ORDER}
+    for part in parts.parts:
+        for bucket, count in part["files"].items():
+            counts[bucket] += count
+    print(
+        f"::notice::Diff: +{counts['added']} ~{counts['modified']} >{counts['moved']} "
+        f"-{counts['deleted']} files ({sections} changed sections) in {len(parts.parts)} "
+        f"parts, {sum(part['bytes'] for part in parts.parts)} bytes compressed"
+    )
     _set_output("skip", "false")
     return 0
 
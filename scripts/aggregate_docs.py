@@ -13,22 +13,62 @@ an `href`. This script uses that convention to build one deployment:
 The result is a single Mintlify site, so search and the AI assistant index all
 products together instead of one deployment per product.
 
+A source can list `versions` (each a `version` name and the `ref` to build it
+from) instead of a single `ref`. Every version is mounted under
+./<mount>/<version>/ and the product gets a version switcher; files the
+versions have in common are stored and rewritten once.
+
 Usage:
     python3 scripts/aggregate_docs.py --output build
     python3 scripts/aggregate_docs.py --output build --use-local ..
+    python3 scripts/aggregate_docs.py --output build --remote file:///srv/git
+    python3 scripts/aggregate_docs.py --output build --cache-dir ~/.cache/falkordb-docs
+    python3 scripts/aggregate_docs.py --output build --use-local .. --incremental
+    python3 scripts/aggregate_docs.py --output build --use-local .. --watch
+    python3 scripts/aggregate_docs.py --output build --check-links --share-assets
+    python3 scripts/aggregate_docs.py --output build --budgets scripts/page-budgets.json
+    python3 scripts/aggregate_docs.py --output build --search-index build/search-index.bin
+    python3 scripts/aggregate_docs.py --output build --report build-report.json --compare main.json
 """
 
 from __future__ import annotations
 
 import argparse
+import base64
+import copy
+import fnmatch
+import hashlib
 import json
 import os
+import posixpath
 import re
 import shutil
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
 from pathlib import Path
+from typing import Callable, Iterable
+
+from mdx_document import HEADING_RE, heading_slug, parse
+from search_index import page_terms, write_index
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; reflinks are Linux-only anyway
+    fcntl = None
+try:
+    import resource
+except ImportError:  # Windows has no getrusage; reports just omit peak memory
+    resource = None
+try:
+    from PIL import Image
+except ImportError:  # only needed for --optimize-images
+    Image = None
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 
@@ -60,12 +100,79 @@ SOURCE_EXCLUDES = BASE_EXCLUDES + (
 # absolutely; once they are part of this deployment those links become internal.
 BASE_SITE = "https://docs.falkordb.com"
 
+# Where sources are cloned from. Overridable so a build can run against local
+# bare repositories standing in for GitHub.
+GITHUB = "https://github.com"
+
+# Clones are retried with exponential backoff: 2s, 4s, ... between attempts.
+CLONE_ATTEMPTS = 3
+CLONE_BACKOFF = 2.0
+
+# Refs in a --cache-dir mirror that hold the fetched tip of each source ref.
+CACHE_REFS = "refs/aggregate"
+MIRROR_LOCKS: dict[Path, threading.Lock] = {}
+MIRROR_LOCKS_GUARD = threading.Lock()
+
+# Written into the output by --incremental builds; see Manifest. Entries do not
+# record how pages were rewritten, so bump the version whenever the rewrites
+# change what a page contains: a warm output directory then rebuilds in full.
+MANIFEST = ".aggregate-manifest.json"
+MANIFEST_VERSION = 2
+
+# Keys that describe a product itself; the rest of a product entry is its
+# navigation, which a versioned product repeats once per version.
+PRODUCT_KEYS = ("product", "icon", "description")
+# Stands in for the version in pages rewritten once for several versions of a
+# source. Pages are text, so it never occurs in one.
+VERSION_SLOT = "\x00"
+
 # Endpoint entries inside an OpenAPI-backed group are operation references, not
 # page paths, and must not be prefixed.
 HTTP_METHOD = re.compile(r"^(GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS|TRACE)\s")
 
 # An absolute path used as a link target, image source or import specifier.
 ABSOLUTE_PATH = re.compile(r"""(?<=[("'])(/[^\s"'()<>]*)""")
+SNIPPET_PATH = re.compile(r"""(?<=["'(])/snippets/""")
+# A route that such a link can point at, i.e. one ABSOLUTE_PATH can match whole.
+ROUTE = re.compile(r"""/[^\s"'()<>#?]*""")
+
+# Files the build rewrites in place, which must never share data with a source.
+REWRITTEN_SUFFIXES = (".mdx",)
+
+# ioctl that makes a file a copy-on-write clone of another (btrfs, XFS, ...).
+FICLONE = 0x40049409
+
+# Binary assets --share-assets stores once, and where it puts them.
+ASSET_SUFFIXES = (
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico", ".mp4", ".webm", ".pdf",
+)
+SHARED_ASSETS = "shared-assets"
+# A path to an asset, as a link target, attribute value or string literal.
+ASSET_REFERENCE = re.compile(
+    r"""(?<=[("'`])([^\s"'`()<>]+\.(?:"""
+    + "|".join(suffix[1:] for suffix in ASSET_SUFFIXES)
+    + r"""))(?=[?#\s"'`()<>]|\Z)""",
+    re.IGNORECASE,
+)
+
+# Raster images --optimize-images re-encodes as WebP, and how.
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif")
+# Everything a page can show as an image, for the page weight report.
+IMAGE_FORMATS = IMAGE_SUFFIXES + (".webp", ".avif", ".svg", ".ico")
+IMAGE_MAX_WIDTH = 1600
+IMAGE_QUALITY = 80
+
+# How often --watch looks for changes, in seconds.
+WATCH_INTERVAL = 0.5
+
+# Build reports: the format version, and the shortest phase --compare will
+# treat as a regression, since anything quicker is mostly timer noise.
+REPORT_VERSION = 1
+MIN_TIMED = 0.25
+
+# With --jobs, pages are rewritten in chunks of this size; fewer pages than
+# that are not worth a round trip to a worker process.
+PAGES_PER_CHUNK = 64
 
 
 def log(message: str) -> None:
@@ -148,28 +255,110 @@ def own_product(config: dict, product: str, label: str) -> dict:
     fail(f"{label}: no product {product!r} in navigation.products (found {known})")
 
 
+def versioned_product(versions: list[tuple[str, dict]]) -> dict:
+    """One product entry switching between the rewritten navigation of each version."""
+    first = versions[0][1]
+    entry = {key: first[key] for key in PRODUCT_KEYS if key in first}
+    entry["versions"] = [
+        {"version": version, **{k: v for k, v in navigation.items() if k not in PRODUCT_KEYS}}
+        for version, navigation in versions
+    ]
+    return entry
+
+
 # --------------------------------------------------------------------------- #
 # content mounting
 # --------------------------------------------------------------------------- #
 
 
-def copy_tree(src: Path, dest: Path, excludes: tuple[str, ...]) -> None:
+def reflink(src: str, dest: str) -> bool:
+    """Clone src's data into dest copy-on-write, where the filesystem supports it."""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as source, open(dest, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        # dest is never created when src can't be opened.
+        Path(dest).unlink(missing_ok=True)
+        return False
+    shutil.copystat(src, dest)
+    return True
+
+
+def place_file(src: str, dest: str, mode: str = "copy", report: Report | None = None) -> str:
+    """Copy a file into the build, sharing its data when the build never writes it.
+
+    Pages are rewritten in place, so they always get a private copy. Anything
+    else can be a reflink (copy-on-write, always safe) or a hardlink, which is
+    safe because the build only ever replaces files through write_file().
+    """
+    linked = False
+    if mode != "copy" and not dest.endswith(REWRITTEN_SUFFIXES):
+        if os.path.lexists(dest):
+            os.unlink(dest)
+        linked = mode in ("reflink", "auto") and reflink(src, dest)
+        if not linked and mode in ("hardlink", "auto"):
+            try:
+                os.link(src, dest)
+                linked = True
+            except OSError:
+                pass  # e.g. across filesystems
+    if not linked:
+        shutil.copy2(src, dest)
+    if report:
+        size = os.path.getsize(dest)
+        report.count(**{"bytes_linked" if linked else "bytes_copied": size})
+    return dest
+
+
+def write_file(path: Path, text: str) -> None:
+    """Write a build file, replacing rather than writing through a shared link."""
+    path.unlink(missing_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def copy_tree(
+    src: Path,
+    dest: Path,
+    excludes: tuple[str, ...],
+    mode: str = "copy",
+    report: Report | None = None,
+) -> None:
     shutil.copytree(
         src,
         dest,
         ignore=shutil.ignore_patterns(*excludes),
+        copy_function=partial(place_file, mode=mode, report=report),
         dirs_exist_ok=True,
         symlinks=False,
     )
 
 
-def addressable_paths(root: Path, extra: set[str]) -> set[str]:
+def plan_tree(
+    src: Path, excludes: tuple[str, ...], skip: Path | None = None
+) -> tuple[list[str], list[str]]:
+    """The directories and files copy_tree would create, relative to src."""
+    ignore = shutil.ignore_patterns(*excludes)
+    dirs: list[str] = []
+    files: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(src, followlinks=True):
+        here = Path(dirpath)
+        ignored = ignore(dirpath, dirnames + filenames)
+        dirnames[:] = sorted(
+            d for d in dirnames if d not in ignored and (here / d).resolve() != skip
+        )
+        relative = here.relative_to(src).as_posix()
+        prefix = "" if relative == "." else relative + "/"
+        dirs += [prefix + d for d in dirnames]
+        files += [prefix + f for f in sorted(filenames) if f not in ignored]
+    return dirs, files
+
+
+def addressable_paths(files: list[str], extra: set[str]) -> set[str]:
     """Every absolute path a repo can legitimately link to before it is mounted."""
     known = set(extra)
-    for path in root.rglob("*"):
-        if not path.is_file():
-            continue
-        relative = path.relative_to(root).as_posix()
+    for relative in files:
         if relative.endswith(".mdx"):
             route = "/" + relative[: -len(".mdx")]
             known.add(route)
@@ -180,42 +369,25 @@ def addressable_paths(root: Path, extra: set[str]) -> set[str]:
     return known
 
 
-def rewrite_internal_links(root: Path, mount: str, known: set[str]) -> int:
-    """Repoint a repo's own absolute links, assets and snippets at the mount.
-
-    Only paths the source repo actually owns are rewritten, so links to other
-    products and to external sites are left alone.
-    """
-    snippets = re.compile(r"""(?<=["'(])/snippets/""")
-
-    def replace(match: re.Match) -> str:
-        raw = match.group(1)
-        path = raw.split("#")[0].split("?")[0]
-        path = path.rstrip("/") or "/"
-        if path not in known:
-            return raw
-        return f"/{mount}" if raw == "/" else f"/{mount}{raw}"
-
-    changed = 0
-    for path in root.rglob("*.mdx"):
-        text = path.read_text(encoding="utf-8")
-        rewritten = ABSOLUTE_PATH.sub(replace, text)
-        rewritten = snippets.sub(f"/snippets/{mount}/", rewritten)
-        if rewritten != text:
-            path.write_text(rewritten, encoding="utf-8")
-            changed += 1
-    return changed
-
-
-def mount_snippets(src: Path, output: Path, mount: str) -> None:
+def mount_snippets(
+    src: Path,
+    output: Path,
+    mount: str,
+    manifest: Manifest | None = None,
+    mode: str = "copy",
+    report: Report | None = None,
+) -> None:
     """Mintlify only resolves snippets under the site root, so namespace them there."""
     snippets = src / "snippets"
     if not snippets.is_dir():
         return
     dest = output / "snippets" / mount
-    if dest.exists():
+    if manifest.claimed(dest) if manifest else dest.exists():
         fail(f"snippet namespace {dest} already exists")
-    copy_tree(snippets, dest, (".git",))
+    if manifest:
+        manifest.sync(snippets, dest, plan_tree(snippets, (".git",)), mount)
+    else:
+        copy_tree(snippets, dest, (".git",), mode, report)
 
 
 def mintignore_rules(src: Path, mount: str) -> list[str]:
@@ -260,23 +432,247 @@ def navigation_routes(node, found: set[str]) -> set[str]:
     return found
 
 
-def mount_source(src: Path, output: Path, mount: str, entry: dict) -> None:
+def check_mount(output: Path, mount: str, manifest: Manifest | None = None) -> None:
+    """Fail unless nothing in the build is at mount yet."""
     dest = output / mount
-    if dest.exists():
+    if manifest.claimed(dest) if manifest else dest.exists():
         fail(f"mount point {mount!r} collides with existing content in the base repo")
-    copy_tree(src, dest, SOURCE_EXCLUDES)
-    mount_snippets(src, output, mount)
-    known = addressable_paths(dest, navigation_routes(entry, set()))
-    changed = rewrite_internal_links(dest, mount, known)
-    pages = sum(1 for _ in dest.rglob("*.mdx"))
+
+
+def mount_source(
+    src: Path,
+    output: Path,
+    mount: str,
+    entry: dict,
+    sites: dict[str, str],
+    manifest: Manifest | None = None,
+    pool: ProcessPoolExecutor | None = None,
+    mode: str = "copy",
+    report: Report | None = None,
+) -> int:
+    """Copy a source under its mount and rewrite its pages' links in one pass.
+
+    Returns how many of its pages had cross-site links internalized.
+    """
+    check_mount(output, mount, manifest)
+    dest = output / mount
+    plan = plan_tree(src, SOURCE_EXCLUDES)
+    known = addressable_paths(plan[1], navigation_routes(entry, set()))
+    if manifest:
+        manifest.sync(src, dest, plan, mount, known)
+    else:
+        copy_tree(src, dest, SOURCE_EXCLUDES, mode, report)
+    mount_snippets(src, output, mount, manifest, mode, report)
+    changed, internalized = rewrite_pages(
+        manifest.pending(dest) if manifest else dest.rglob("*.mdx"),
+        [
+            partial(internal_links, mount=mount, routes=route_pattern(known)),
+            partial(site_links, sites=sites),
+        ],
+        pool,
+        report,
+    )
+    pages = sum(1 for path in plan[1] if path.endswith(".mdx"))
     log(f"  mounted {pages} pages at /{mount} ({changed} with rewritten links)")
+    if report:
+        report.sources.setdefault(mount, {}).update(pages=pages, rewritten=changed)
+    return internalized
+
+
+def mount_versions(
+    versions: list[tuple[dict, Path, dict]],
+    output: Path,
+    sites: dict[str, str],
+    pool: ProcessPoolExecutor | None = None,
+    mode: str = "copy",
+    report: Report | None = None,
+) -> int:
+    """Mount every version of a source, storing and rewriting what they share once.
+
+    `versions` holds each version's source, checkout and own product entry.
+    Releases mostly carry the same files: one identical to a file an earlier
+    version already placed is hardlinked to it. A page is rewritten once for
+    all the versions whose routes treat its links alike, with VERSION_SLOT in
+    place of the version, and each of them gets a copy with the slot filled in.
+
+    Returns how many pages had cross-site links internalized, counting a page
+    shared by several versions once.
+    """
+    check_mount(output, versions[0][0]["product_mount"])
+    plans, known = [], []
+    for source, src, entry in versions:
+        dest = output / source["mount"]
+        plan = plan_tree(src, SOURCE_EXCLUDES)
+        for directory in ["", *plan[0]]:
+            (dest / directory).mkdir(parents=True, exist_ok=True)
+        plans.append(plan)
+        known.append(addressable_paths(plan[1], navigation_routes(entry, set())))
+
+    # Only files whose size another version repeats can be shared, so other
+    # assets are copied without being hashed.
+    sizes: dict[int, int] = {}
+    for (_, src, _), plan in zip(versions, plans):
+        for relative in plan[1]:
+            size = (src / relative).stat().st_size
+            sizes[size] = sizes.get(size, 0) + 1
+
+    stored: dict[str, str] = {}
+    linked = 0
+    # Per page content, groups of copies that rewrite alike: the version that
+    # rewrites the group, then every (version, page) in it.
+    pages: dict[str, list[tuple[int, list[tuple[str, Path]]]]] = {}
+    # Per pair of versions, the routes only one of them has; a page mentioning
+    # none of them is rewritten the same way for both.
+    differing: dict[tuple[int, int], re.Pattern | None] = {}
+    for i, ((source, src, _), plan) in enumerate(zip(versions, plans)):
+        dest = output / source["mount"]
+        for relative in plan[1]:
+            path, target = src / relative, dest / relative
+            if relative.endswith(".mdx"):
+                text = path.read_text(encoding="utf-8")
+                key = digest(text)
+                for j, group in pages.setdefault(key, []):
+                    if (j, i) not in differing:
+                        routes = known[j] ^ known[i]
+                        differing[j, i] = re.compile(trie_pattern(routes)) if routes else None
+                    if differing[j, i] is None or not differing[j, i].search(text):
+                        group.append((source["version"], target))
+                        break
+                else:
+                    place_file(str(path), str(target), mode, report)
+                    pages[key].append((i, [(source["version"], target)]))
+                continue
+            key = blob_hash(path) if sizes[path.stat().st_size] > 1 else None
+            if key in stored:
+                try:
+                    os.link(stored[key], target)
+                    linked += 1
+                    if report:
+                        report.count(bytes_linked=path.stat().st_size)
+                    continue
+                except OSError:
+                    pass  # e.g. across filesystems
+            copied = place_file(str(path), str(target), mode, report)
+            if key:
+                stored.setdefault(key, copied)
+
+    mount = versions[0][0]["product_mount"]
+    internalized = 0
+    for i, (source, src, _) in enumerate(versions):
+        versioned = f"{mount}/{VERSION_SLOT}"
+        rewrite = partial(internal_links, mount=versioned, routes=route_pattern(known[i]))
+        firsts = [group[0][1] for groups in pages.values() for j, group in groups if j == i]
+        internalized += rewrite_pages(
+            firsts, [rewrite, partial(site_links, sites=sites)], pool, report
+        )[1]
+        mount_snippets(src, output, source["mount"], None, mode, report)
+
+    shared = 0
+    for groups in pages.values():
+        for _, group in groups:
+            text = group[0][1].read_text(encoding="utf-8")
+            for n, (version, page) in enumerate(group):
+                if n or VERSION_SLOT in text:
+                    write_file(page, text.replace(VERSION_SLOT, version))
+            shared += len(group) - 1
+
+    for (source, _, _), plan in zip(versions, plans):
+        pages = sum(1 for path in plan[1] if path.endswith(".mdx"))
+        log(f"  mounted {pages} pages at /{source['mount']}")
+        if report:
+            report.sources.setdefault(source["mount"], {}).update(pages=pages)
+    log(f"  versions: {linked} files stored once, {shared} page rewrites shared")
+    return internalized
 
 
-def internalize_site_links(output: Path, sites: dict[str, str]) -> int:
-    """Turn absolute links between the product sites into links within this one."""
-    pattern = re.compile(
-        "(" + "|".join(re.escape(site) for site in sites) + r")(?=[/\s\)\"'#]|$)"
+# --------------------------------------------------------------------------- #
+# link rewriting
+# --------------------------------------------------------------------------- #
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """A regex matching exactly `words`, factored into a trie.
+
+    Python's re tries the branches of an alternation one by one; sharing
+    prefixes means a candidate costs a step per character instead of an
+    attempt per word, however many words there are. Longer words win.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def route_pattern(known: set[str]) -> re.Pattern:
+    """Compile a mount's known routes into a regex matching only links to them.
+
+    A match covers the route at the start of an ABSOLUTE_PATH link, before any
+    trailing slashes, anchor or query, so the path never has to be split and
+    normalised per link, and links to anything else are skipped by the regex.
+    """
+    routes = [
+        route[1:]
+        for route in known
+        if ROUTE.fullmatch(route) and (route == "/" or not route.endswith("/"))
+    ]
+    if not routes:
+        return re.compile(r"(?!)")
+    return re.compile(
+        r"""(?<=[("'])/""" + trie_pattern(routes) + r"""(?=/*(?:[#?\s"'()<>]|\Z))"""
     )
+
+
+@lru_cache(maxsize=None)
+def site_pattern(sites: tuple[str, ...]) -> re.Pattern:
+    return re.compile("(" + trie_pattern(sites) + r")(?=[/\s\)\"'#]|$)")
+
+
+# Rewrites are module-level functions bound with functools.partial, so they can
+# be shipped to worker processes by --jobs. Each returns the new text and its
+# number of regex matches, and checks for a plain substring first, so pages
+# without a candidate link never reach the regex. They are applied to a page's
+# text outside code only, so samples keep their links as written.
+
+Rewrite = Callable[[str], tuple[str, int]]
+
+
+def internal_links(text: str, mount: str, routes: re.Pattern) -> tuple[str, int]:
+    """Repoint a repo's own absolute links, assets and snippets at the mount.
+
+    Only paths the source repo actually owns (see route_pattern) are
+    rewritten, so links to other products and to external sites are left alone.
+    """
+    def replace(match: re.Match) -> str:
+        # A bare link to the root becomes the mount itself, without a slash.
+        if match.group(0) == "/" and not text.startswith(("/", "#", "?"), match.end()):
+            return f"/{mount}"
+        return f"/{mount}{match.group(0)}"
+
+    matches = 0
+    if "(/" in text or '"/' in text or "'/" in text:
+        text, matches = routes.subn(replace, text)
+    if "/snippets/" in text:
+        text, snippets = SNIPPET_PATH.subn(f"/snippets/{mount}/", text)
+        matches += snippets
+    return text, matches
+
+
+def site_links(text: str, sites: dict[str, str]) -> tuple[str, int]:
+    """Turn absolute links between the product sites into links within this one."""
+    if not any(site in text for site in sites):
+        return text, 0
+
     def replace(match: re.Match) -> str:
         mount = sites[match.group(1)]
         if mount:
@@ -284,14 +680,728 @@ def internalize_site_links(output: Path, sites: dict[str, str]) -> int:
         # The base site is the root, so let a following path stand on its own.
         return "" if match.string[match.end() : match.end() + 1] == "/" else "/"
 
-    changed = 0
-    for path in output.rglob("*.mdx"):
+    return site_pattern(tuple(sites)).subn(replace, text)
+
+
+def rewrite_chunk(pages: list[Path], rewrites: list[Rewrite]) -> list[int]:
+    """Apply every rewrite to each page in turn, reading and writing it once.
+
+    Returns, for each rewrite, the number of pages it changed, followed by the
+    number of pages written and the number of regex matches.
+    """
+    counts = [0] * (len(rewrites) + 2)
+    for path in pages:
+        runs = parse(path.read_text(encoding="utf-8")).runs()
+        written = False
+        for i, rewrite in enumerate(rewrites):
+            changed = False
+            for j, (editable, text) in enumerate(runs):
+                if not editable:
+                    continue
+                rewritten, matches = rewrite(text)
+                counts[-1] += matches
+                if rewritten != text:
+                    runs[j] = (True, rewritten)
+                    changed = True
+            counts[i] += changed
+            written |= changed
+        if written:
+            write_file(path, "".join(text for _, text in runs))
+            counts[-2] += 1
+    return counts
+
+
+def rewrite_pages(
+    pages: Iterable[Path],
+    rewrites: list[Rewrite],
+    pool: ProcessPoolExecutor | None = None,
+    report: Report | None = None,
+) -> list[int]:
+    """rewrite_chunk() over many pages, split across a process pool if given.
+
+    Returns, for each rewrite, the number of pages it changed. Pages are
+    independent of each other, and the counts are summed in chunk order, so
+    the result does not depend on how the work was scheduled.
+    """
+    pages = list(pages)
+    if pool is None or len(pages) <= PAGES_PER_CHUNK:
+        counts = rewrite_chunk(pages, rewrites)
+    else:
+        chunks = [pages[i : i + PAGES_PER_CHUNK] for i in range(0, len(pages), PAGES_PER_CHUNK)]
+        results = pool.map(rewrite_chunk, chunks, [rewrites] * len(chunks))
+        counts = [sum(column) for column in zip(*results)]
+    if report:
+        report.count(pages_scanned=len(pages), pages_rewritten=counts[-2],
+                     regex_matches=counts[-1])
+    return counts[:-2]
+
+
+def rewrite_internal_links(
+    root: Path,
+    mount: str,
+    known: set[str],
+    pages: list[Path] | None = None,
+    pool: ProcessPoolExecutor | None = None,
+    report: Report | None = None,
+) -> int:
+    """Run internal_links() over every page under root, or just `pages`."""
+    pages = root.rglob("*.mdx") if pages is None else pages
+    rewrite = partial(internal_links, mount=mount, routes=route_pattern(known))
+    return rewrite_pages(pages, [rewrite], pool, report)[0]
+
+
+def internalize_site_links(
+    output: Path,
+    sites: dict[str, str],
+    pages: list[Path] | None = None,
+    pool: ProcessPoolExecutor | None = None,
+    report: Report | None = None,
+) -> int:
+    """Run site_links() over every page under output, or just `pages`."""
+    pages = output.rglob("*.mdx") if pages is None else pages
+    return rewrite_pages(pages, [partial(site_links, sites=sites)], pool, report)[0]
+
+
+def unmounted_pages(output: Path, mounts: list[str]) -> list[Path]:
+    """Pages outside every mount: the base repo's own, plus hoisted snippets."""
+    mounted = {output / mount for mount in mounts}
+    pages = []
+    for dirpath, dirnames, filenames in os.walk(output):
+        here = Path(dirpath)
+        dirnames[:] = [d for d in dirnames if here / d not in mounted]
+        pages += [here / name for name in filenames if name.endswith(".mdx")]
+    return pages
+
+
+# --------------------------------------------------------------------------- #
+# shared assets
+# --------------------------------------------------------------------------- #
+
+
+def duplicate_assets(output: Path) -> dict[str, list[str]]:
+    """Binary assets stored more than once in the build, grouped by blob hash.
+
+    Only files that share a size are hashed, so unique assets are never read.
+    """
+    by_size: dict[int, list[Path]] = {}
+    for dirpath, dirnames, filenames in os.walk(output):
+        here = Path(dirpath)
+        if here == output:
+            dirnames[:] = [d for d in dirnames if d != SHARED_ASSETS]
+        for name in filenames:
+            if name.lower().endswith(ASSET_SUFFIXES):
+                path = here / name
+                by_size.setdefault(path.stat().st_size, []).append(path)
+
+    groups: dict[str, list[str]] = {}
+    for paths in by_size.values():
+        if len(paths) < 2:
+            continue
+        for path in paths:
+            relative = path.relative_to(output).as_posix()
+            groups.setdefault(blob_hash(path), []).append(relative)
+    return {blob: sorted(paths) for blob, paths in groups.items() if len(paths) > 1}
+
+
+def asset_links(text: str, assets: re.Pattern, moved: dict[str, str]) -> tuple[str, int]:
+    """Point absolute references to a duplicated asset at its shared copy."""
+    return assets.subn(lambda match: moved[match.group(0)], text)
+
+
+def replace_strings(node, moved: dict[str, str]):
+    """node with every string that is a key of moved replaced by its value."""
+    if isinstance(node, list):
+        return [replace_strings(item, moved) for item in node]
+    if isinstance(node, dict):
+        return {key: replace_strings(value, moved) for key, value in node.items()}
+    return moved.get(node, node) if isinstance(node, str) else node
+
+
+def text_files(output: Path) -> list[Path]:
+    """Files in the build that can refer to an asset: everything that reads as
+    UTF-8 text except assets, docs.json (kept in memory until the end of the
+    build) and the manifest."""
+    files = []
+    for path in output.rglob("*"):
+        if (
+            path.name.lower().endswith(ASSET_SUFFIXES)
+            or path.relative_to(output).as_posix() in ("docs.json", MANIFEST)
+            or not path.is_file()
+        ):
+            continue
+        try:
+            path.read_bytes().decode("utf-8")
+        except UnicodeDecodeError:
+            continue
+        files.append(path)
+    return files
+
+
+def asset_references(text: str, directory: str | None) -> tuple[set[str], set[str]]:
+    """The assets text refers to: absolute routes, and relative path tails.
+
+    Relative references are resolved against directory, the route of the
+    file's directory. Where that is None (components, stylesheets) they
+    resolve against whatever includes the file, so only their tail, such
+    as "/img/logo.png" for "../img/logo.png", is known.
+    """
+    routes, tails = set(), set()
+    for target in ASSET_REFERENCE.findall(text):
+        if target.startswith("/"):
+            routes.add(posixpath.normpath(target))
+        elif directory is not None:
+            routes.add(posixpath.normpath(posixpath.join(directory, target)))
+        else:
+            tails.add("/" + re.sub(r"^(?:\.\./)+", "", posixpath.normpath(target)))
+    return routes, tails
+
+
+def relink_assets(
+    output: Path,
+    config: dict,
+    moved: dict[str, str],
+    pool: ProcessPoolExecutor | None = None,
+    report: Report | None = None,
+) -> set[str]:
+    """Repoint absolute asset references in the build's text files and docs.json.
+
+    moved maps old routes to new ones. Returns the old routes something in
+    the build still refers to afterwards (through a relative reference, say,
+    or from code the rewrite leaves alone), whose files must therefore stay.
+    Code in pages is not a reference; everywhere else, any path that ends
+    like a moved asset's keeps it.
+    """
+    pattern = re.compile(
+        r"""(?<=[("'])""" + trie_pattern(moved) + r"""(?=[?#\s"'()<>]|\Z)"""
+    )
+    files = text_files(output)
+    rewrite_pages(files, [partial(asset_links, assets=pattern, moved=moved)], pool, report)
+    config.update(replace_strings(config, moved))
+
+    routes, tails = asset_references(json.dumps(config), "/")
+    for path in files:
         text = path.read_text(encoding="utf-8")
-        rewritten = pattern.sub(replace, text)
-        if rewritten != text:
-            path.write_text(rewritten, encoding="utf-8")
-            changed += 1
-    return changed
+        relative = path.relative_to(output).as_posix()
+        if relative.endswith(".mdx"):
+            found = asset_references(parse(text).blanked(), "/" + posixpath.dirname(relative))
+        else:
+            found = asset_references(text, None)
+        routes |= found[0]
+        tails |= found[1]
+    return {
+        route
+        for route in moved
+        if route in routes or any(route.endswith(tail) for tail in tails)
+    }
+
+
+def share_assets(
+    output: Path,
+    config: dict,
+    pool: ProcessPoolExecutor | None = None,
+    report: Report | None = None,
+) -> tuple[int, int]:
+    """Store each duplicated asset once under /shared-assets/<hash> and relink it.
+
+    References are absolute in every mounted product, so they are rewritten
+    in every text file and in docs.json; see relink_assets() for what is kept.
+
+    Returns the number of copies removed and the bytes they took.
+    """
+    groups = duplicate_assets(output)
+    if not groups:
+        return 0, 0
+    moved = {}
+    for blob, paths in groups.items():
+        suffix = Path(paths[0]).suffix.lower()
+        for relative in paths:
+            moved["/" + relative] = f"/{SHARED_ASSETS}/{blob}{suffix}"
+    still_used = relink_assets(output, config, moved, pool, report)
+
+    (output / SHARED_ASSETS).mkdir(exist_ok=True)
+    removed = saved = 0
+    for blob, paths in groups.items():
+        shared = output / moved["/" + paths[0]].lstrip("/")
+        shutil.copy2(output / paths[0], shared)
+        for relative in paths:
+            path = output / relative
+            if "/" + relative not in still_used:
+                saved += path.stat().st_size
+                path.unlink()
+                removed += 1
+        saved -= shared.stat().st_size
+    return removed, max(saved, 0)
+
+
+def optimize_image(path: Path, cache: Path) -> Path | None:
+    """Write a WebP version of a raster image next to it (foo.png.webp), through the cache.
+
+    The image is scaled down to IMAGE_MAX_WIDTH if wider. Results are cached by
+    the input's blob hash and the encoder settings, including the verdict that
+    re-encoding does not help (animations, unreadable or already small files), so an
+    unchanged image costs one hash on the next build. Returns the new file, or
+    None if the original should stay.
+    """
+    key = digest([blob_hash(path), IMAGE_MAX_WIDTH, IMAGE_QUALITY])
+    cached, skipped = cache / f"{key}.webp", cache / f"{key}.skip"
+    if skipped.exists():
+        return None
+    if not cached.exists():
+        partial_file = cache / f"{key}.{os.getpid()}.tmp"
+        try:
+            with Image.open(path) as image:
+                if getattr(image, "is_animated", False):
+                    skipped.touch()
+                    return None
+                image.thumbnail((IMAGE_MAX_WIDTH, image.height))
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+                image.save(partial_file, "WEBP", quality=IMAGE_QUALITY, method=6)
+        except OSError:  # not an image Pillow can read; publish it as it is
+            partial_file.unlink(missing_ok=True)
+            skipped.touch()
+            return None
+        if partial_file.stat().st_size >= path.stat().st_size:
+            partial_file.unlink()
+            skipped.touch()
+            return None
+        os.replace(partial_file, cached)
+
+    # Named after the whole file name, so foo.png and foo.jpg never race
+    # each other for foo.webp on the pool.
+    target = path.with_name(path.name + ".webp")
+    shutil.copyfile(cached, target)
+    return target
+
+
+def optimize_images(
+    output: Path,
+    config: dict,
+    cache: Path,
+    pool: ProcessPoolExecutor | None = None,
+    report: Report | None = None,
+) -> tuple[int, int]:
+    """Replace the build's raster images with smaller WebP versions.
+
+    Encoding runs on the process pool if given. Returns the number of images
+    replaced and the bytes saved.
+    """
+    cache.mkdir(parents=True, exist_ok=True)
+    images = [
+        path
+        for path in output.rglob("*")
+        if path.suffix.lower() in IMAGE_SUFFIXES and path.is_file()
+    ]
+    encode = partial(optimize_image, cache=cache)
+    results = list(pool.map(encode, images) if pool else map(encode, images))
+    moved = {
+        "/" + image.relative_to(output).as_posix(): "/" + webp.relative_to(output).as_posix()
+        for image, webp in zip(images, results)
+        if webp
+    }
+    if not moved:
+        return 0, 0
+    still_used = relink_assets(output, config, moved, pool, report)
+
+    saved = 0
+    for image, webp in zip(images, results):
+        if webp:
+            saved += image.stat().st_size - webp.stat().st_size
+            if "/" + image.relative_to(output).as_posix() not in still_used:
+                image.unlink()
+    return len(moved), saved
+
+
+# --------------------------------------------------------------------------- #
+# page weights
+# --------------------------------------------------------------------------- #
+
+
+EMBED = re.compile(r"<(?:iframe|video)\b", re.IGNORECASE)
+WEIGHTS = ("mdx_bytes", "images", "image_bytes", "embeds", "code_blocks", "links")
+
+
+def weigh_chunk(pages: list[Path], output: Path) -> list[dict[str, int]]:
+    """WEIGHTS for each page; images are measured in the build itself."""
+    weights = []
+    for path in pages:
+        raw = path.read_bytes()
+        document = parse(raw.decode("utf-8"))
+        prose = document.blanked()
+        images, links = set(), 0
+        for match in LINK_TARGET.finditer(prose):
+            target = match.group(1) or match.group(2)
+            if not target:
+                continue  # an import
+            if target.split("?")[0].lower().endswith(IMAGE_FORMATS):
+                images.add(target)
+            else:
+                links += 1
+        image_bytes = 0
+        for target in images:
+            local = output / target.split("?")[0].lstrip("/")
+            if target.startswith("/") and local.is_file():
+                image_bytes += local.stat().st_size
+        weights.append(
+            {
+                "mdx_bytes": len(raw),
+                "images": len(images),
+                "image_bytes": image_bytes,
+                "embeds": len(EMBED.findall(prose)),
+                "code_blocks": document.code_blocks,
+                "links": links,
+            }
+        )
+    return weights
+
+
+def page_weights(output: Path, pool: ProcessPoolExecutor | None = None) -> dict[str, dict]:
+    """The weight of every page in the build, keyed by its path in the build."""
+    pages = sorted(output.rglob("*.mdx"))
+    if pool is None or len(pages) <= PAGES_PER_CHUNK:
+        weights = weigh_chunk(pages, output)
+    else:
+        chunks = [pages[i : i + PAGES_PER_CHUNK] for i in range(0, len(pages), PAGES_PER_CHUNK)]
+        results = pool.map(weigh_chunk, chunks, [output] * len(chunks))
+        weights = [page for chunk in results for page in chunk]
+    return {page.relative_to(output).as_posix(): weight for page, weight in zip(pages, weights)}
+
+
+def over_budget(weights: dict[str, dict], budgets: dict) -> list[str]:
+    """Every page weight above its budget.
+
+    budgets maps WEIGHTS to limits, and may carry "pages": {glob: {...}} whose
+    limits replace the defaults for the pages matching glob (last match wins).
+    """
+    overrides = budgets.get("pages", {})
+    for where, limits in [("budgets", budgets), *overrides.items()]:
+        unknown = sorted(set(limits) - set(WEIGHTS) - ({"pages"} if limits is budgets else set()))
+        if unknown:
+            fail(f"{where}: unknown budget {', '.join(unknown)} (expected {', '.join(WEIGHTS)})")
+    defaults = {key: value for key, value in budgets.items() if key in WEIGHTS}
+    problems = []
+    for page, weight in weights.items():
+        limits = dict(defaults)
+        for pattern, specific in overrides.items():
+            if fnmatch.fnmatch(page, pattern):
+                limits.update(specific)
+        for key, limit in limits.items():
+            if weight[key] > limit:
+                problems.append(f"{page}: {key} {weight[key]} > {limit}")
+    return problems
+
+
+# --------------------------------------------------------------------------- #
+# search index
+# --------------------------------------------------------------------------- #
+
+
+def page_route(relative: str) -> str:
+    """The route a page in the build is served at."""
+    route = "/" + relative[: -len(".mdx")]
+    if route == "/index":
+        return "/"
+    return route[: -len("/index")] if route.endswith("/index") else route
+
+
+def index_chunk(pages: list[Path], output: Path) -> list[tuple[str, str, dict[str, int]]]:
+    """(route, title, terms) for each page; see search_index.page_terms()."""
+    entries = []
+    for path in pages:
+        title, terms = page_terms(path.read_text(encoding="utf-8"))
+        entries.append((page_route(path.relative_to(output).as_posix()), title, terms))
+    return entries
+
+
+def build_search_index(
+    output: Path, path: Path, pool: ProcessPoolExecutor | None = None
+) -> tuple[int, int, int]:
+    """Index every page in the build into path.
+
+    Returns how many pages and terms it holds, and its size in bytes.
+    Snippets are only ever shown inside other pages, so they are left out.
+    """
+    pages = sorted(
+        page for page in output.rglob("*.mdx")
+        if not page.relative_to(output).as_posix().startswith("snippets/")
+    )
+    if pool is None or len(pages) <= PAGES_PER_CHUNK:
+        entries = index_chunk(pages, output)
+    else:
+        chunks = [pages[i : i + PAGES_PER_CHUNK] for i in range(0, len(pages), PAGES_PER_CHUNK)]
+        results = pool.map(index_chunk, chunks, [output] * len(chunks))
+        entries = [entry for chunk in results for entry in chunk]
+    terms, size = write_index(path, entries)
+    return len(entries), terms, size
+
+
+# --------------------------------------------------------------------------- #
+# link checking
+# --------------------------------------------------------------------------- #
+
+
+# Link targets a page actually navigates to: markdown links and images, JSX
+# href/src attributes, and MDX import specifiers.
+LINK_TARGET = re.compile(
+    r"""\]\(\s*<?([^\s()<>]+)"""
+    r"""|\b(?:href|src)=["']([^"']+)["']"""
+    r"""|^import\s.*?\bfrom\s+["']([^"']+)["']""",
+    re.MULTILINE,
+)
+# Targets that leave the site: a URL scheme (https:, mailto:...) or a
+# protocol-relative //host. JSX expressions are not addresses at all.
+EXTERNAL_TARGET = re.compile(r"^(?:[A-Za-z][\w+.-]*:|//|\{)")
+# Snippet components, whose links are checked as well as the pages'.
+SNIPPET_CODE_SUFFIXES = (".jsx", ".tsx", ".js")
+EXPLICIT_ID = re.compile(r"""\bid=["']([^"']+)["']""")
+
+
+def scan_chunk(pages: list[Path]) -> list[tuple[set[str], list[tuple[int, str]]]]:
+    """The anchors each page defines and the (line, target) of each link in it."""
+    scanned = []
+    for path in pages:
+        text = parse(path.read_text(encoding="utf-8")).blanked()
+        anchors, seen = set(EXPLICIT_ID.findall(text)), {}
+        for _, heading in HEADING_RE.findall(text):
+            slug = heading_slug(heading)
+            count = seen.get(slug, 0)
+            seen[slug] = count + 1
+            anchors.add(f"{slug}-{count}" if count else slug)
+        links = []
+        for match in LINK_TARGET.finditer(text):
+            target = match.group(1) or match.group(2) or match.group(3)
+            if not EXTERNAL_TARGET.match(target):
+                links.append((text.count("\n", 0, match.start()) + 1, target))
+        scanned.append((anchors, links))
+    return scanned
+
+
+def redirect_sources(redirects: list[dict]) -> tuple[set[str], re.Pattern | None]:
+    """Literal redirect sources, and one pattern matching every wildcard source."""
+    literal, patterns = set(), []
+    for entry in redirects:
+        source = entry["source"]
+        if not is_pattern(source):
+            literal.add(source.rstrip("/") or "/")
+            continue
+        pattern = re.escape(source)
+        pattern = re.sub(r":\w+\\\*|\\\*", ".*", pattern)
+        patterns.append(re.sub(r":\w+", "[^/]+", pattern))
+    return literal, re.compile("|".join(patterns)) if patterns else None
+
+
+def check_links(
+    output: Path, config: dict, pool: ProcessPoolExecutor | None = None
+) -> tuple[list[str], list[str], list[str]]:
+    """Internal links and snippet imports in the build that have no target.
+
+    A route is valid if a file or page serves it, the navigation declares it,
+    or a redirect catches it. Relative targets are resolved against the
+    page's directory. Pages and snippet components are scanned, on the
+    process pool if given.
+
+    Returns the broken links; separately the links to missing anchors, since
+    heading slugs are only approximated here, so those are worth a look
+    rather than a failed build; and the relative links in snippet components,
+    which resolve against whichever page imports them and so can't be checked.
+    """
+    _, files = plan_tree(output, (MANIFEST,))
+    literal, wildcard = redirect_sources(config.get("redirects", []))
+    known = addressable_paths(files, navigation_routes(config.get("navigation", {}), literal))
+    pages = [
+        relative
+        for relative in files
+        if relative.endswith(".mdx")
+        or relative.startswith("snippets/") and relative.endswith(SNIPPET_CODE_SUFFIXES)
+    ]
+    paths = [output / relative for relative in pages]
+
+    if pool is None or len(paths) <= PAGES_PER_CHUNK:
+        scanned = scan_chunk(paths)
+    else:
+        chunks = [paths[i : i + PAGES_PER_CHUNK] for i in range(0, len(paths), PAGES_PER_CHUNK)]
+        scanned = [page for chunk in pool.map(scan_chunk, chunks) for page in chunk]
+
+    anchors = {}
+    for relative, (defined, _) in zip(pages, scanned):
+        if not relative.endswith(".mdx"):
+            continue
+        route = "/" + relative[: -len(".mdx")]
+        anchors[route] = defined
+        if route.endswith("/index"):
+            anchors[route[: -len("/index")] or "/"] = defined
+
+    broken, unanchored, unchecked = [], [], []
+    for relative, (defined, links) in zip(pages, scanned):
+        page = relative.endswith(".mdx")
+        for line, target in links:
+            path, _, anchor = target.partition("#")
+            path = path.split("?")[0]
+            if not path.startswith("/") and not page:
+                unchecked.append(f"{relative}:{line}: {target}")
+                continue
+            if path and not path.startswith("/"):
+                path = posixpath.normpath(posixpath.join("/", posixpath.dirname(relative), path))
+            if not path:
+                if anchor and anchor not in defined:
+                    unanchored.append(f"{relative}:{line}: {target}")
+                continue
+            if path.endswith(".mdx"):
+                if not (output / path.lstrip("/")).is_file():
+                    broken.append(f"{relative}:{line}: {target}")
+                continue
+            route = path.rstrip("/") or "/"
+            if route not in known and not (wildcard and wildcard.fullmatch(route)):
+                broken.append(f"{relative}:{line}: {target}")
+            elif anchor and route in anchors and anchor not in anchors[route]:
+                unanchored.append(f"{relative}:{line}: {target}")
+    return broken, unanchored, unchecked
+
+
+# --------------------------------------------------------------------------- #
+# incremental builds
+# --------------------------------------------------------------------------- #
+
+
+def blob_hash(path: Path) -> str:
+    """The git blob id of a file, so manifest entries can be checked against git."""
+    data = path.read_bytes()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def read_manifest(output: Path) -> dict[str, dict] | None:
+    """The file entries of the manifest in output, or None if there is no
+    usable one: missing, unreadable, or from another MANIFEST_VERSION."""
+    try:
+        data = json.loads((output / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return None
+    files = data.get("files")
+    return files if isinstance(files, dict) else None
+
+
+class Manifest:
+    """What every output file of an --incremental build was produced from.
+
+    Each entry records the blob hash of the file it was copied from, the mount
+    that owns it and, for pages, digests of the link-rewriting inputs: the
+    mount's known routes and the sites map. A file is copied and rewritten
+    again only when one of those changed, and files nothing produces any more
+    are deleted, so the output matches a clean build.
+    """
+
+    def __init__(
+        self,
+        output: Path,
+        sites: dict[str, str],
+        previous: dict[str, dict],
+        mode: str = "copy",
+        report: Report | None = None,
+    ):
+        self.output = output
+        self.sites = dict(sites)
+        self.mode = mode
+        self.report = report
+        self.routes: dict[str, list[str]] = {}
+        self.previous = previous
+        self.files: dict[str, dict] = {}
+        self.dirs: set[str] = set()
+        self.copied: list[Path] = []
+        self.kept = 0
+        self.removed = 0
+
+        # Dropped until save(), so a build that dies halfway starts clean next time.
+        (output / MANIFEST).unlink(missing_ok=True)
+
+    def relative(self, path: Path) -> str:
+        return path.relative_to(self.output).as_posix()
+
+    def claimed(self, path: Path) -> bool:
+        """Whether this build already put anything at or below path."""
+        prefix = self.relative(path) + "/"
+        return any(f.startswith(prefix) for f in self.files)
+
+    def sync(
+        self,
+        src: Path,
+        dest: Path,
+        plan: tuple[list[str], list[str]],
+        mount: str,
+        routes: set[str] | None = None,
+    ) -> None:
+        """Copy the planned files of src that changed since the last build."""
+        base = "" if dest == self.output else self.relative(dest) + "/"
+        routes_key = None
+        if routes is not None:
+            self.routes[mount] = sorted(routes)
+            routes_key = digest(self.routes[mount])
+        sites_key = digest(list(self.sites.items()))
+
+        parts = base.rstrip("/").split("/") if base else []
+        self.dirs.update("/".join(parts[: i + 1]) for i in range(len(parts)))
+        dirs, files = plan
+        for directory in dirs:
+            (dest / directory).mkdir(parents=True, exist_ok=True)
+            self.dirs.add(base + directory)
+        dest.mkdir(parents=True, exist_ok=True)
+
+        for relative in files:
+            page = relative.endswith(".mdx")
+            entry = {
+                "blob": blob_hash(src / relative),
+                "mount": mount,
+                "routes": routes_key if page else None,
+                "sites": sites_key if page else None,
+            }
+            self.files[base + relative] = entry
+            target = dest / relative
+            if self.previous.get(base + relative) == entry and target.is_file():
+                self.kept += 1
+                continue
+            place_file(str(src / relative), str(target), self.mode, self.report)
+            self.copied.append(target)
+
+        # Files this tree produced last time but no longer does.
+        for relative, entry in self.previous.items():
+            if (
+                entry["mount"] == mount
+                and relative.startswith(base)
+                and relative not in self.files
+                and (self.output / relative).is_file()
+            ):
+                (self.output / relative).unlink()
+                self.removed += 1
+
+    def pending(self, root: Path) -> list[Path]:
+        """Pages under root copied by this build, which still need rewriting."""
+        return [p for p in self.copied if p.suffix == ".mdx" and root in p.parents]
+
+    def prune(self) -> None:
+        """Delete what no part of this build produced, including emptied directories."""
+        for relative in self.previous:
+            if relative not in self.files and (self.output / relative).is_file():
+                (self.output / relative).unlink()
+                self.removed += 1
+        for dirpath, _, _ in sorted(os.walk(self.output), reverse=True):
+            path = Path(dirpath)
+            if path != self.output and self.relative(path) not in self.dirs:
+                if not any(path.iterdir()):
+                    path.rmdir()
+
+    def save(self) -> None:
+        data = {
+            "version": MANIFEST_VERSION,
+            "sites": self.sites,
+            "routes": self.routes,
+            "files": self.files,
+        }
+        write_file(self.output / MANIFEST, json.dumps(data, indent=1, sort_keys=True) + "\n")
 
 
 # --------------------------------------------------------------------------- #
@@ -299,18 +1409,32 @@ def internalize_site_links(output: Path, sites: dict[str, str]) -> int:
 # --------------------------------------------------------------------------- #
 
 
+def site_origin(url: str) -> str:
+    """scheme://host of an absolute URL, or the URL unchanged if it has no path."""
+    scheme, sep, rest = url.partition("://")
+    return scheme + sep + rest.split("/", 1)[0] if sep else url
+
+
 def internalize_redirects(redirects: list[dict], sites: dict[str, str]) -> list[dict]:
     """Point redirects at the mounted content instead of the standalone sites.
 
     The base repo keeps absolute URLs so it still validates on its own; once a
     product is part of this deployment those destinations become internal paths.
-    Redirects that collapse onto their own source are dropped, since Mintlify
-    resolves redirects before pages and a self-redirect would loop.
+    Sites are indexed by origin, so each redirect costs one lookup however many
+    products are mounted. Redirects that collapse onto their own source are
+    dropped, since Mintlify resolves redirects before pages and a self-redirect
+    would loop.
     """
+    index: dict[str, list[tuple[str, str]]] = {}
+    for site, mount in sites.items():
+        index.setdefault(site_origin(site), []).append((site, mount))
+    for candidates in index.values():
+        candidates.sort(key=lambda item: len(item[0]), reverse=True)
+
     out = []
     for entry in redirects:
         destination = entry["destination"]
-        for site, mount in sites.items():
+        for site, mount in index.get(site_origin(destination), ()):
             if destination == site or destination.startswith(site + "/"):
                 tail = destination[len(site) :].lstrip("/")
                 destination = f"/{mount}/{tail}" if tail else f"/{mount}"
@@ -321,33 +1445,224 @@ def internalize_redirects(redirects: list[dict], sites: dict[str, str]) -> list[
     return out
 
 
+def is_pattern(path: str) -> bool:
+    """Whether a redirect path uses Mintlify's :param or * wildcard syntax."""
+    return ":" in path or "*" in path
+
+
+def flatten_redirects(redirects: list[dict], routes: set[str]) -> tuple[list[dict], list[str]]:
+    """Collapse redirect chains to one hop and drop entries that can never apply.
+
+    A destination that is itself the source of another redirect is replaced by
+    where that chain ends, so readers take a single hop. Entries that repeat an
+    earlier source are unreachable and dropped, as are cycles, which would only
+    loop. Sources that are also real routes are kept but reported: Mintlify
+    resolves redirects first, so the page behind them cannot be reached.
+
+    Returns the table and a description of every problem found.
+    """
+    table: dict[str, dict] = {}
+    problems = []
+    for entry in redirects:
+        if entry["source"] in table:
+            problems.append(f"duplicate source {entry['source']} (first one wins)")
+        else:
+            table[entry["source"]] = entry
+
+    def follow(source: str) -> str | None:
+        """Where a chain starting at source ends, or None if it loops."""
+        seen = {source}
+        destination = table[source]["destination"]
+        while destination in table and not is_pattern(destination):
+            if destination in seen:
+                return None
+            seen.add(destination)
+            destination = table[destination]["destination"]
+        return destination
+
+    out = []
+    for source, entry in table.items():
+        destination = entry["destination"]
+        if not is_pattern(destination) and destination in table:
+            destination = follow(source)
+            if destination is None:
+                problems.append(f"cycle through {source}")
+                continue
+        if (source.rstrip("/") or "/") in routes:
+            problems.append(f"{source} shadows a page in the navigation")
+        out.append({**entry, "destination": destination})
+    return out, problems
+
+
 # --------------------------------------------------------------------------- #
 # sources
 # --------------------------------------------------------------------------- #
 
 
-def resolve_source(source: dict, workdir: Path, use_local: Path | None) -> Path:
+def expand_versions(sources: list[dict]) -> list[dict]:
+    """Turn every source with `versions` into one source per version.
+
+    Each version names the ref it is built from and is mounted under
+    <mount>/<version>; the first one listed is the default, which the
+    source's site URL points at.
+    """
+    expanded = []
+    for source in sources:
+        versions = source.get("versions")
+        if not versions:
+            expanded.append(source)
+            continue
+        for i, version in enumerate(versions):
+            name = version["version"]
+            expanded.append({
+                **source,
+                "ref": version.get("ref", name),
+                "mount": f"{source['mount']}/{name}",
+                "version": name,
+                "product_mount": source["mount"],
+                "default": i == 0,
+            })
+    return expanded
+
+
+def remote_url(owner: str, repo: str, remote: str) -> str:
+    return f"{remote.rstrip('/')}/{owner}/{repo}.git"
+
+
+def git_auth(remote: str) -> list[str]:
+    """Config that authenticates git against an HTTPS remote.
+
+    The token travels in a header rather than the URL, so it is never written
+    to a clone's or mirror's config.
+    """
+    token = os.environ.get("DOCS_TOKEN") or os.environ.get("GITHUB_TOKEN", "")
+    if not token or not remote.startswith("https://"):
+        return []
+    basic = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+    return ["-c", f"http.extraHeader=Authorization: Basic {basic}"]
+
+
+def run_git(command: list[str], label: str, cleanup: Path | None = None, **kwargs) -> None:
+    """Run a networked git command, retrying transient failures with backoff."""
+    for attempt in range(1, CLONE_ATTEMPTS + 1):
+        proc = subprocess.run(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, **kwargs
+        )
+        if proc.returncode == 0:
+            return
+        reason = (proc.stderr.strip().splitlines() or [f"exit {proc.returncode}"])[0]
+        if attempt == CLONE_ATTEMPTS:
+            fail(f"{label}: failed after {attempt} attempts: {reason}")
+        delay = CLONE_BACKOFF * 2 ** (attempt - 1)
+        log(f"  {label}: attempt {attempt} failed ({reason}), retrying in {delay:g}s")
+        if cleanup is not None:
+            shutil.rmtree(cleanup, ignore_errors=True)
+        time.sleep(delay)
+
+
+def clone(source: dict, checkout: Path, remote: str) -> None:
+    """Shallow-clone a source into a throwaway checkout."""
+    owner, repo = source["owner"], source["repo"]
+    ref = source.get("ref", "main")
+    run_git(
+        ["git", *git_auth(remote), "clone", "--quiet", "--depth", "1", "--branch", ref,
+         remote_url(owner, repo, remote), str(checkout)],
+        f"{owner}/{repo}@{ref}",
+        cleanup=checkout,
+    )
+
+
+def mirror_lock(mirror: Path) -> threading.Lock:
+    """Serialise work on one mirror when several sources share a repository."""
+    with MIRROR_LOCKS_GUARD:
+        return MIRROR_LOCKS.setdefault(mirror, threading.Lock())
+
+
+def sync_mirror(source: dict, cache: Path, remote: str) -> Path:
+    """Bring the cached bare mirror of a source up to date with its ref.
+
+    The mirror is a blobless partial clone: fetching a ref moves only new
+    commits and trees, and blobs are fetched on demand when they are checked
+    out, so only the files under the source's subdirectory are ever downloaded.
+    """
+    owner, repo = source["owner"], source["repo"]
+    ref = source.get("ref", "main")
+    mirror = cache / owner / f"{repo}.git"
+
+    if not (mirror / "HEAD").is_file():
+        mirror.mkdir(parents=True, exist_ok=True)
+        subprocess.run(["git", "init", "--quiet", "--bare", str(mirror)], check=True)
+        for key, value in (
+            ("remote.origin.url", remote_url(owner, repo, remote)),
+            ("remote.origin.promisor", "true"),
+            ("remote.origin.partialclonefilter", "blob:none"),
+        ):
+            subprocess.run(["git", "-C", str(mirror), "config", key, value], check=True)
+
+    run_git(
+        ["git", *git_auth(remote), "-C", str(mirror), "fetch", "--quiet", "--no-tags",
+         "--depth", "1", "--filter=blob:none", "origin", f"+{ref}:{CACHE_REFS}/{ref}"],
+        f"{owner}/{repo}@{ref}",
+    )
+    return mirror
+
+
+def materialize(
+    source: dict, mirror: Path, checkout: Path, remote: str, commit: str | None = None
+) -> None:
+    """Check out only the source's subdirectory from its mirror (or any git dir)."""
+    ref = source.get("ref", "main")
+    commit = commit or f"{CACHE_REFS}/{ref}"
+    subdirectory = source.get("subdirectory", ".").strip("/")
+    tree = f"{commit}^{{tree}}" if subdirectory in ("", ".") else f"{commit}:{subdirectory}"
+    dest = checkout / subdirectory
+    dest.mkdir(parents=True, exist_ok=True)
+
+    # A private index keeps the bare mirror untouched; reading the subtree
+    # with -u fetches every missing blob in a single batch.
+    env = {**os.environ, "GIT_INDEX_FILE": str(checkout.parent / f".{checkout.name}.index")}
+    run_git(
+        ["git", *git_auth(remote), "--git-dir", str(mirror), "--work-tree", str(dest),
+         "read-tree", "--reset", "-u", tree],
+        f"{source['owner']}/{source['repo']}@{ref}:{subdirectory or '.'}",
+        env=env,
+    )
+
+
+def resolve_source(
+    source: dict,
+    workdir: Path,
+    use_local: Path | None,
+    remote: str = GITHUB,
+    cache: Path | None = None,
+) -> Path:
     owner, repo = source["owner"], source["repo"]
     subdirectory = source.get("subdirectory", ".")
+    # Versions of one repository each need a checkout of their own.
+    name = f"{repo}@{source['version']}" if "version" in source else repo
 
     if use_local:
         checkout = use_local / repo
         if not checkout.is_dir():
             fail(f"{owner}/{repo}: no local checkout at {checkout}")
-        log(f"  using local checkout {checkout}")
+        if not source.get("default", True):
+            # Only the default version is the working tree; others come from its refs.
+            local, checkout = checkout, workdir / owner / name
+            git_dir = subprocess.run(
+                ["git", "-C", str(local), "rev-parse", "--absolute-git-dir"],
+                capture_output=True, text=True,
+            ).stdout.strip()
+            if not git_dir:
+                fail(f"{owner}/{repo}: {local} is not a git repository")
+            materialize(source, Path(git_dir), checkout, remote, source["ref"])
+    elif cache:
+        checkout = workdir / owner / name
+        with mirror_lock(cache / owner / repo):
+            mirror = sync_mirror(source, cache, remote)
+            materialize(source, mirror, checkout, remote)
     else:
-        checkout = workdir / repo
-        token = os.environ.get("DOCS_TOKEN") or os.environ.get("GITHUB_TOKEN", "")
-        credentials = f"x-access-token:{token}@" if token else ""
-        url = f"https://{credentials}github.com/{owner}/{repo}.git"
-        log(f"  cloning {owner}/{repo}@{source.get('ref', 'main')}")
-        subprocess.run(
-            ["git", "clone", "--depth", "1", "--branch", source.get("ref", "main"),
-             url, str(checkout)],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=None,
-        )
+        checkout = workdir / owner / name
+        clone(source, checkout, remote)
 
     docs = (checkout / subdirectory).resolve()
     if not (docs / "docs.json").is_file():
@@ -355,6 +1670,324 @@ def resolve_source(source: dict, workdir: Path, use_local: Path | None) -> Path:
     return docs
 
 
+def fetch_sources(
+    sources: list[dict],
+    workdir: Path,
+    use_local: Path | None,
+    remote: str,
+    jobs: int,
+    cache: Path | None = None,
+    report: Report | None = None,
+) -> list[Path]:
+    """Resolve every source concurrently, returning checkouts in source order.
+
+    Clones are network-bound, so they run in a bounded thread pool; mounting
+    happens afterwards in the order of sources.json, which keeps the output
+    identical to a sequential build.
+    """
+    for source in sources:
+        if use_local and not source.get("default", True):
+            log(f"  reading {source['ref']} from local checkout {use_local / source['repo']}")
+        elif use_local:
+            log(f"  using local checkout {use_local / source['repo']}")
+        else:
+            verb = "updating mirror of" if cache else "cloning"
+            log(f"  {verb} {source['owner']}/{source['repo']}@{source.get('ref', 'main')}")
+
+    def fetch(source: dict) -> Path:
+        if not report:
+            return resolve_source(source, workdir, use_local, remote, cache)
+        with report.phase("fetch", source["mount"]):
+            return resolve_source(source, workdir, use_local, remote, cache)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(fetch, source) for source in sources]
+        return [future.result() for future in futures]
+
+
+# --------------------------------------------------------------------------- #
+# watch mode
+# --------------------------------------------------------------------------- #
+
+
+def snapshot(root: Path, excludes: tuple[str, ...], skip: Path | None = None) -> dict:
+    """(mtime, size) of every file copy_tree would copy from root."""
+    stats = {}
+    for relative in plan_tree(root, excludes, skip)[1]:
+        try:
+            stat = (root / relative).stat()
+        except FileNotFoundError:
+            continue  # deleted while we looked
+        stats[relative] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+class Watcher:
+    """Keeps a finished build in step with the base repo and the local checkouts.
+
+    Navigation entries, route sets and the sites map stay in memory, so an
+    edited page is recopied and rewritten on its own. A changed docs.json only
+    regenerates its own product's navigation, and adding or removing a file
+    only re-mounts its source when that changes the routes it can link to.
+    """
+
+    def __init__(
+        self,
+        output: Path,
+        sources: list[dict],
+        checkouts: list[Path],
+        sites: dict[str, str],
+        mode: str = "copy",
+    ):
+        self.output = output
+        self.sources = {source["mount"]: source for source in sources}
+        self.checkouts = {source["mount"]: docs for source, docs in zip(sources, checkouts)}
+        self.sites = sites
+        self.site_map = {**sites, BASE_SITE: ""}
+        self.mode = mode
+        self.config = json.loads((REPO_ROOT / "docs.json").read_text(encoding="utf-8"))
+        self.entries: dict[str, dict] = {}
+        self.navigation: dict[str, dict] = {}
+        self.routes: dict[str, set[str]] = {}
+        for mount in self.checkouts:
+            self.load_navigation(mount)
+            self.routes[mount] = self.known_routes(mount)
+        self.snapshots = {mount: self.snapshot(mount) for mount in ["", *self.checkouts]}
+
+    def snapshot(self, mount: str) -> dict:
+        """Everything in a repo that can affect the build; "" is the base repo."""
+        if not mount:
+            stats = snapshot(REPO_ROOT, BASE_EXCLUDES, self.output)
+            root = REPO_ROOT
+        else:
+            root = self.checkouts[mount]
+            stats = snapshot(root, SOURCE_EXCLUDES)
+            if (root / "snippets").is_dir():
+                snippets = snapshot(root / "snippets", (".git",))
+                stats.update({f"snippets/{path}": stat for path, stat in snippets.items()})
+        for name in ("docs.json", ".mintignore"):
+            if (root / name).is_file():
+                stat = (root / name).stat()
+                stats[name] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def load_navigation(self, mount: str) -> bool:
+        """Re-read a source's own product entry; False if docs.json is unusable."""
+        source, docs = self.sources[mount], self.checkouts[mount]
+        try:
+            config = json.loads((docs / "docs.json").read_text(encoding="utf-8"))
+            entry = own_product(config, source["product"], f"{source['owner']}/{source['repo']}")
+        except (OSError, ValueError, SystemExit):
+            # own_product() exits on errors that should stop a build, not a watch.
+            log(f"  {mount}: docs.json is not usable, keeping the previous navigation")
+            return False
+        self.entries[mount] = entry
+        self.navigation[mount] = rewrite_navigation(entry, mount)
+        return True
+
+    def known_routes(self, mount: str) -> set[str]:
+        files = plan_tree(self.checkouts[mount], SOURCE_EXCLUDES)[1]
+        return addressable_paths(files, navigation_routes(self.entries[mount], set()))
+
+    def place(self, src: Path, dest: Path, rewrites: list[Rewrite]) -> None:
+        """Copy one file into the build and rewrite it, or remove it if src is gone."""
+        if not src.is_file():
+            if dest.exists():
+                dest.unlink()
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        place_file(str(src), str(dest), self.mode)
+        if dest.suffix == ".mdx":
+            rewrite_pages([dest], rewrites)
+
+    def write_config(self) -> None:
+        config = copy.deepcopy(self.config)
+        products = config.get("navigation", {}).get("products", [])
+        for mount, source in self.sources.items():
+            for i, product in enumerate(products):
+                if product.get("product") == source["product"]:
+                    products[i] = self.navigation[mount]
+        redirects = internalize_redirects(config.get("redirects", []), self.sites)
+        routes = navigation_routes(config.get("navigation", {}), set())
+        config["redirects"], _ = flatten_redirects(redirects, routes)
+        text = json.dumps(config, indent=2, ensure_ascii=False) + "\n"
+        write_file(self.output / "docs.json", text)
+
+    def write_mintignore(self) -> None:
+        ignores = mintignore_rules(REPO_ROOT, "")
+        for mount, docs in self.checkouts.items():
+            ignores += mintignore_rules(docs, mount)
+        write_file(self.output / ".mintignore", "\n".join(ignores) + "\n")
+
+    def update(self, mount: str, changed: set[str]) -> tuple[int, bool]:
+        """Bring one repo's changed paths into the build.
+
+        Returns how many files were placed, and whether docs.json must be rewritten.
+        """
+        site = partial(site_links, sites=self.site_map)
+        navigation = "docs.json" in changed
+        if not mount:
+            if navigation:
+                try:
+                    self.config = json.loads((REPO_ROOT / "docs.json").read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    log("  docs.json is not usable, keeping the previous one")
+                    navigation = False
+            pages = changed - {"docs.json", ".mintignore"}
+            for relative in pages:
+                self.place(REPO_ROOT / relative, self.output / relative, [site])
+            return len(pages), navigation
+
+        docs = self.checkouts[mount]
+        if navigation:
+            navigation = self.load_navigation(mount)
+        routes = self.known_routes(mount)
+        if routes != self.routes[mount]:
+            # Links in unchanged pages may now resolve differently: re-mount it all.
+            self.routes[mount] = routes
+            changed = changed | set(self.snapshots[mount])
+        internal = partial(internal_links, mount=mount, routes=route_pattern(routes))
+
+        placed = 0
+        for relative in changed - {"docs.json", ".mintignore"}:
+            if relative.startswith("snippets/"):
+                dest = self.output / "snippets" / mount / relative[len("snippets/") :]
+                self.place(docs / relative, dest, [site])
+            else:
+                self.place(docs / relative, self.output / mount / relative, [internal, site])
+            placed += 1
+        return placed, navigation
+
+    def poll(self) -> None:
+        started = time.perf_counter()
+        placed, navigation, ignores = 0, False, False
+        for mount, before in self.snapshots.items():
+            after = self.snapshot(mount)
+            changed = {path for path in before.keys() | after.keys()
+                       if before.get(path) != after.get(path)}
+            self.snapshots[mount] = after
+            if not changed:
+                continue
+            files, renavigated = self.update(mount, changed)
+            placed += files
+            navigation |= renavigated
+            ignores |= ".mintignore" in changed
+        if navigation:
+            self.write_config()
+        if ignores:
+            self.write_mintignore()
+        if placed or navigation or ignores:
+            elapsed = (time.perf_counter() - started) * 1000
+            redone = {"docs.json": navigation, ".mintignore": ignores}
+            extra = "".join(f" and {name}" for name, done in redone.items() if done)
+            log(f"watch: updated {placed} files{extra} in {elapsed:.0f} ms")
+
+    def run(self) -> None:
+        log(f"watch: watching {REPO_ROOT} and {len(self.checkouts)} checkouts (Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(WATCH_INTERVAL)
+                self.poll()
+        except KeyboardInterrupt:
+            log("watch: stopped")
+
+
+# --------------------------------------------------------------------------- #
+# build report
+# --------------------------------------------------------------------------- #
+
+
+class Report:
+    """Where a build spent its time, for --profile and --report.
+
+    Times are wall-clock seconds; the counters are deterministic for a given
+    set of inputs, so two reports can be diffed and compared by compare().
+    """
+
+    COUNTERS = (
+        "bytes_copied",
+        "bytes_linked",
+        "pages_scanned",
+        "pages_rewritten",
+        "regex_matches",
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.sources: dict[str, dict] = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, source: str | None = None):
+        """Time a build phase, or one source's share of it."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                if source is None:
+                    self.phases[name] = self.phases.get(name, 0.0) + elapsed
+                else:
+                    self.sources.setdefault(source, {})[name] = elapsed
+
+    def count(self, **counts: int) -> None:
+        with self.lock:
+            for name, value in counts.items():
+                self.counters[name] += value
+
+    def as_dict(self) -> dict:
+        peak = {}
+        if resource:
+            # Kilobytes on Linux; workers and git show up as children.
+            peak = {
+                "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+            }
+        return {
+            "version": REPORT_VERSION,
+            "total": round(time.perf_counter() - self.started, 3),
+            "phases": {name: round(value, 3) for name, value in self.phases.items()},
+            "sources": {
+                mount: {k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()}
+                for mount, stats in self.sources.items()
+            },
+            "counters": self.counters,
+            "peak_rss_kb": peak,
+        }
+
+    def summary(self) -> list[str]:
+        data = self.as_dict()
+        lines = [f"  {name:<12} {seconds:8.3f}s" for name, seconds in data["phases"].items()]
+        for mount, stats in data["sources"].items():
+            times = " ".join(f"{k}={v:.3f}s" for k, v in stats.items() if isinstance(v, float))
+            lines.append(f"  /{mount:<11} {times}")
+        lines += [f"  {name:<16} {value}" for name, value in data["counters"].items()]
+        lines += [f"  peak_rss_{who:<7} {kb} KB" for who, kb in data["peak_rss_kb"].items()]
+        lines.append(f"  {'total':<12} {data['total']:8.3f}s")
+        return lines
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Time and memory regressions of report against baseline.
+
+    Counters are left out: they move with the content, and a plain diff of the
+    two reports already shows them. Phases shorter than MIN_TIMED are noise.
+    """
+    regressions = []
+    for name, seconds in report["phases"].items():
+        before = baseline.get("phases", {}).get(name)
+        if before is not None and seconds > max(before, MIN_TIMED) * (1 + tolerance):
+            regressions.append(f"{name}: {before:.3f}s -> {seconds:.3f}s")
+    for who, kb in report["peak_rss_kb"].items():
+        before = baseline.get("peak_rss_kb", {}).get(who)
+        if before is not None and kb > before * (1 + tolerance):
+            regressions.append(f"peak rss ({who}): {before} KB -> {kb} KB")
+    return regressions
+
+
 # --------------------------------------------------------------------------- #
 
 
@@ -367,64 +2000,326 @@ def main() -> None:
         metavar="DIR",
         help="use sibling checkouts in DIR instead of cloning (for local testing)",
     )
+    parser.add_argument(
+        "--remote",
+        default=GITHUB,
+        metavar="URL",
+        help="clone <owner>/<repo>.git from URL instead of GitHub (e.g. file:///srv/git)",
+    )
+    parser.add_argument(
+        "--fetch-jobs",
+        type=int,
+        default=4,
+        metavar="N",
+        help="clone up to N sources at the same time (default: 4)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="keep a bare mirror of every source in DIR and fetch only what changed",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="rewrite pages in N worker processes (0: one per CPU; default: 1)",
+    )
+    parser.add_argument(
+        "--copy-mode",
+        choices=("copy", "hardlink", "reflink", "auto"),
+        default="copy",
+        help="how to bring files other than pages into the build; auto tries a "
+        "reflink, then a hardlink, then a copy (default: copy)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"reuse a previous --output, redoing only what changed (tracked in {MANIFEST})",
+    )
+    parser.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help="re-encode PNG, JPEG and GIF images as smaller WebP files (needs Pillow)",
+    )
+    parser.add_argument(
+        "--image-cache",
+        metavar="DIR",
+        help="cache --optimize-images results here (default: images/ under --cache-dir, "
+        "or ~/.cache/falkordb-docs/images)",
+    )
+    parser.add_argument(
+        "--share-assets",
+        action="store_true",
+        help=f"store assets that are shipped more than once a single time, under /{SHARED_ASSETS}",
+    )
+    parser.add_argument(
+        "--search-index",
+        metavar="FILE",
+        help="write a compressed full-text index of every page to FILE (see search_index.py)",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="fail if a page links to a route or snippet that does not exist",
+    )
+    parser.add_argument(
+        "--weights",
+        metavar="FILE",
+        help="write the size, images, embeds, code blocks and links of every page to FILE",
+    )
+    parser.add_argument(
+        "--budgets",
+        metavar="FILE",
+        help="fail if a page's weight goes over the limits in this JSON file",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after building, keep the output in step with edits to the base repo and "
+        "the --use-local checkouts",
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="log where the build spent its time"
+    )
+    parser.add_argument(
+        "--report", metavar="FILE", help="write timings and counters to FILE as JSON"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="fail if this build regressed against the report in FILE",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="how much slower or bigger than --compare counts as a regression (default: 0.5)",
+    )
     args = parser.parse_args()
 
+    report = Report()
     output = Path(args.output).resolve()
     if output == REPO_ROOT:
         fail("--output must not be the repository root")
-    if output.exists():
+    if args.incremental and (args.share_assets or args.optimize_images):
+        # The manifest tracks files where the sources put them, not where they moved.
+        fail("--share-assets and --optimize-images cannot be combined with --incremental")
+    if args.watch and not args.use_local:
+        fail("--watch needs --use-local: there is nothing to watch in a fresh clone")
+    if args.watch and (args.share_assets or args.optimize_images):
+        # Both move files the watcher would then put back where the sources have them.
+        fail("--share-assets and --optimize-images cannot be combined with --watch")
+    if args.optimize_images and Image is None:
+        fail("--optimize-images needs Pillow (pip install Pillow)")
+    # Without a manifest it can trust, an incremental build can't tell which
+    # files in the output are stale, so it starts from an empty one too.
+    previous = read_manifest(output) if args.incremental else None
+    if output.exists() and previous is None:
         shutil.rmtree(output)
 
-    sources = json.loads(Path(args.sources).read_text(encoding="utf-8"))
+    sources = expand_versions(json.loads(Path(args.sources).read_text(encoding="utf-8")))
+    if args.watch and any("version" in source for source in sources):
+        fail("--watch does not follow sources with versions")
     config = json.loads((REPO_ROOT / "docs.json").read_text(encoding="utf-8"))
     products = config.get("navigation", {}).get("products")
     if not products:
         fail("docs.json has no navigation.products")
 
+    # Known up front, since every page's cross-site links depend on all of them.
+    sites = {
+        source["site"].rstrip("/"): source["mount"]
+        for source in sources
+        if source.get("site") and source.get("default", True)
+    }
+    site_map = {**sites, BASE_SITE: ""}
+    manifest = None
+    if args.incremental:
+        manifest = Manifest(output, site_map, previous or {}, args.copy_mode, report)
+
     log(f"base: copying {REPO_ROOT.name} to {output}")
-    copy_tree(REPO_ROOT, output, BASE_EXCLUDES)
+    with report.phase("base"):
+        if manifest:
+            manifest.sync(REPO_ROOT, output, plan_tree(REPO_ROOT, BASE_EXCLUDES, output), "")
+        else:
+            copy_tree(REPO_ROOT, output, BASE_EXCLUDES, args.copy_mode, report)
 
     use_local = Path(args.use_local).resolve() if args.use_local else None
-    sites: dict[str, str] = {}
+    cache = Path(args.cache_dir).resolve() if args.cache_dir else None
     ignores = mintignore_rules(REPO_ROOT, "")
+    internalized = 0
+    jobs = args.jobs or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
 
     with tempfile.TemporaryDirectory() as tmp:
-        for source in sources:
-            product, mount = source["product"], source["mount"]
-            log(f"{product}:")
-
-            docs = resolve_source(source, Path(tmp), use_local)
-            source_config = json.loads((docs / "docs.json").read_text(encoding="utf-8"))
-            entry = own_product(source_config, product, f"{source['owner']}/{source['repo']}")
-
-            index = next(
-                (i for i, p in enumerate(products) if p.get("product") == product), None
+        log(f"fetch: {len(sources)} sources")
+        with report.phase("fetch"):
+            checkouts = fetch_sources(
+                sources, Path(tmp), use_local, args.remote, args.fetch_jobs, cache, report
             )
-            if index is None:
-                fail(f"docs.json has no product {product!r} to replace")
-            if "href" not in products[index]:
-                fail(f"docs.json product {product!r} is already populated")
-
-            mount_source(docs, output, mount, entry)
-            products[index] = rewrite_navigation(entry, mount)
-            ignores += mintignore_rules(docs, mount)
-            if source.get("site"):
-                sites[source["site"].rstrip("/")] = mount
 
-    (output / ".mintignore").write_text("\n".join(ignores) + "\n", encoding="utf-8")
-
-    changed = internalize_site_links(output, {**sites, BASE_SITE: ""})
-    log(f"links: internalized cross-product URLs in {changed} pages")
-
-    before = len(config.get("redirects", []))
-    config["redirects"] = internalize_redirects(config.get("redirects", []), sites)
-    log(f"redirects: {before} -> {len(config['redirects'])} after internalizing")
-
-    (output / "docs.json").write_text(
-        json.dumps(config, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
-    )
+        with report.phase("mount"):
+            # Only the versions of one source share a product: each starts
+            # with its default version. Any other source naming a product
+            # that is already filled in is an error, caught below.
+            groups: list[list[tuple[dict, Path]]] = []
+            for source, docs in zip(sources, checkouts):
+                if "version" in source and not source["default"]:
+                    groups[-1].append((source, docs))
+                else:
+                    groups.append([(source, docs)])
+            for group in groups:
+                product = group[0][0]["product"]
+                log(f"{product}:")
+                group = [
+                    (source, docs, own_product(
+                        json.loads((docs / "docs.json").read_text(encoding="utf-8")),
+                        product,
+                        f"{source['owner']}/{source['repo']}",
+                    ))
+                    for source, docs in group
+                ]
+
+                index = next(
+                    (i for i, p in enumerate(products) if p.get("product") == product), None
+                )
+                if index is None:
+                    fail(f"docs.json has no product {product!r} to replace")
+                if "href" not in products[index]:
+                    fail(f"docs.json product {product!r} is already populated")
+
+                if len(group) > 1 and not manifest:
+                    with report.phase("mount", group[0][0]["product_mount"]):
+                        internalized += mount_versions(
+                            group, output, site_map, pool, args.copy_mode, report
+                        )
+                else:
+                    if "version" in group[0][0]:
+                        check_mount(output, group[0][0]["product_mount"], manifest)
+                    for source, docs, entry in group:
+                        with report.phase("mount", source["mount"]):
+                            internalized += mount_source(
+                                docs, output, source["mount"], entry, site_map, manifest, pool,
+                                args.copy_mode, report,
+                            )
+                navigation = [
+                    (source.get("version"), rewrite_navigation(entry, source["mount"]))
+                    for source, _, entry in group
+                ]
+                products[index] = (
+                    versioned_product(navigation) if "version" in group[0][0] else navigation[0][1]
+                )
+                for source, docs, _ in group:
+                    ignores += mintignore_rules(docs, source["mount"])
+
+    if manifest:
+        manifest.prune()
+        log(f"incremental: {len(manifest.copied)} files copied, {manifest.kept} unchanged, "
+            f"{manifest.removed} removed")
+
+    search_index = Path(args.search_index).resolve() if args.search_index else None
+    if search_index and search_index.is_relative_to(output):
+        # Published with the site for other tools, but not part of it.
+        ignores.append(search_index.relative_to(output).as_posix())
+    write_file(output / ".mintignore", "\n".join(ignores) + "\n")
+
+    # Mounted pages were internalized as they were mounted; this covers the rest.
+    mounts = [source["mount"] for source in sources]
+    base_pages = unmounted_pages(output, mounts)
+    if manifest:
+        pending = set(manifest.pending(output))
+        base_pages = [path for path in base_pages if path in pending]
+    with report.phase("links"):
+        internalized += internalize_site_links(output, site_map, base_pages, pool, report)
+    log(f"links: internalized cross-product URLs in {internalized} pages")
+
+    if args.optimize_images:
+        if args.image_cache:
+            image_cache = Path(args.image_cache).resolve()
+        elif cache:
+            image_cache = cache / "images"
+        else:
+            image_cache = Path.home() / ".cache" / "falkordb-docs" / "images"
+        with report.phase("images"):
+            optimized, saved = optimize_images(output, config, image_cache, pool, report)
+        log(f"images: re-encoded {optimized} images as WebP, saving {saved} bytes")
+
+    if args.share_assets:
+        with report.phase("assets"):
+            removed, saved = share_assets(output, config, pool, report)
+        log(f"assets: removed {removed} duplicate copies, saving {saved} bytes")
+
+    with report.phase("redirects"):
+        before = len(config.get("redirects", []))
+        redirects = internalize_redirects(config.get("redirects", []), sites)
+        routes = navigation_routes(config.get("navigation", {}), set())
+        config["redirects"], problems = flatten_redirects(redirects, routes)
+    log(f"redirects: {before} -> {len(config['redirects'])} after internalizing and flattening")
+    for problem in problems:
+        log(f"  warning: {problem}")
+
+    with report.phase("write"):
+        write_file(output / "docs.json", json.dumps(config, indent=2, ensure_ascii=False) + "\n")
+        if manifest:
+            manifest.save()
     log(f"done: {sum(1 for _ in output.rglob('*.mdx'))} pages in {output}")
 
+    if search_index:
+        with report.phase("search"):
+            pages, terms, size = build_search_index(output, search_index, pool)
+        log(f"search: indexed {pages} pages, {terms} terms in {size} bytes")
+
+    broken = []
+    if args.check_links:
+        with report.phase("check"):
+            broken, unanchored, unchecked = check_links(output, config, pool)
+        log(
+            f"check: {len(broken)} broken links, {len(unanchored)} to missing anchors, "
+            f"{len(unchecked)} relative links in snippets not checked"
+        )
+        for problem in broken:
+            log(f"  {problem}")
+        for problem in unanchored:
+            log(f"  warning: no such anchor: {problem}")
+        for problem in unchecked:
+            log(f"  warning: relative link in a snippet: {problem}")
+
+    heavy = []
+    if args.weights or args.budgets:
+        with report.phase("weights"):
+            weights = page_weights(output, pool)
+        if args.weights:
+            Path(args.weights).write_text(json.dumps(weights, indent=2, sort_keys=True) + "\n")
+            log(f"weights: wrote {len(weights)} pages to {args.weights}")
+        if args.budgets:
+            budgets = json.loads(Path(args.budgets).read_text(encoding="utf-8"))
+            heavy = over_budget(weights, budgets)
+            log(f"weights: {len(heavy)} over budget")
+            for problem in heavy:
+                log(f"  {problem}")
+    if pool:
+        pool.shutdown()
+
+    data = report.as_dict()
+    if args.profile:
+        log("profile:")
+        for line in report.summary():
+            log(line)
+    if args.report:
+        Path(args.report).write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+        log(f"report: wrote {args.report}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(data, baseline, args.tolerance)
+        if regressions:
+            fail("regressed against " + args.compare + ":\n  " + "\n  ".join(regressions))
+    if broken:
+        fail(f"{len(broken)} broken links, see above")
+    if heavy:
+        fail(f"{len(heavy)} page weights over budget, see above")
+    if args.watch:
+        Watcher(output, sources, checkouts, sites, args.copy_mode).run()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""Benchmark aggregate_docs.py against generated documentation corpora.
+
+`corpus` writes a synthetic deployment: a base site plus N product repos, each
+a local git repo with M pages, snippets, images, an OpenAPI group, redirects and
+a configurable density of internal, cross-site and external links, and a
+matching sources.json.
+
+`run` generates one corpus per size tier, builds it end to end with
+`aggregate_docs.py --use-local`, then times the individual phases in-process
+(rewrite_navigation, addressable_paths, rewrite_internal_links and
+internalize_redirects), recording wall time and peak memory for each.
+
+Usage:
+    python3 scripts/bench_aggregate.py corpus /tmp/corpus --products 4 --pages 500
+    python3 scripts/bench_aggregate.py run
+    python3 scripts/bench_aggregate.py run --tiers small,large --json bench.json
+    python3 scripts/bench_aggregate.py run --tiers medium -- --jobs 4
+
+Arguments after `--` are passed to aggregate_docs.py. The corpus is a pure
+function of its parameters and --seed, so runs on two branches are comparable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import aggregate_docs as aggregate
+
+SCRIPT = Path(__file__).resolve().parent / "aggregate_docs.py"
+
+# name: (products, pages per product)
+TIERS = {
+    "small": (2, 50),
+    "medium": (4, 500),
+    "large": (8, 2500),
+}
+
+BASE_PRODUCT = "FalkorDB"
+BASE_SITE = aggregate.BASE_SITE
+PAGES_PER_SECTION = 25
+ENDPOINTS = 10
+SNIPPETS = 5
+IMAGES = 5
+
+WORDS = (
+    "graph node edge query index cypher vector property label path match return "
+    "cluster replica memory latency shard schema traversal client driver module"
+).split()
+
+
+def log(message: str) -> None:
+    print(message, flush=True)
+
+
+def fail(message: str) -> None:
+    print(f"error: {message}", file=sys.stderr)
+    sys.exit(1)
+
+
+# --------------------------------------------------------------------------- #
+# corpus
+# --------------------------------------------------------------------------- #
+
+
+def product_names(count: int) -> list[tuple[str, str, str, str]]:
+    """(product, repo, mount, site) for each generated product."""
+    return [
+        (
+            f"Product {i:02d}",
+            f"product-{i:02d}-docs",
+            f"product{i:02d}",
+            f"https://docs.product{i:02d}.example.com",
+        )
+        for i in range(count)
+    ]
+
+
+def page_routes(pages: int) -> list[str]:
+    """Routes of a product's pages, in sections of PAGES_PER_SECTION."""
+    routes = []
+    for i in range(pages):
+        section = f"section-{i // PAGES_PER_SECTION:03d}"
+        if i % PAGES_PER_SECTION == 0:
+            routes.append(f"{section}/index")
+        else:
+            routes.append(f"{section}/page-{i % PAGES_PER_SECTION:03d}")
+    return routes
+
+
+def prose(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def link(rng: random.Random, routes: list[str], sites: list[str]) -> str:
+    """One link of a random kind, weighted towards internal routes."""
+    kind = rng.random()
+    route = rng.choice(routes).removesuffix("/index")
+    if kind < 0.55:
+        anchor = "#" + rng.choice(WORDS) if rng.random() < 0.2 else ""
+        return f"[{rng.choice(WORDS)}](/{route}{anchor})"
+    if kind < 0.75:
+        return f"[{rng.choice(WORDS)}]({rng.choice(sites)}/{route})"
+    if kind < 0.85:
+        return f"![{rng.choice(WORDS)}](/images/figure-{rng.randrange(IMAGES)}.png)"
+    if kind < 0.95:
+        return f"[{rng.choice(WORDS)}](https://example.org/{rng.choice(WORDS)})"
+    return f"[{rng.choice(WORDS)}](/missing/{rng.choice(WORDS)})"
+
+
+def page(
+    rng: random.Random, title: str, routes: list[str], sites: list[str], density: float
+) -> str:
+    """A page of a few sections, with on average `density` links per paragraph."""
+    lines = ["---", f"title: {title}", f"description: {prose(rng, 8)}", "---", ""]
+    if rng.random() < 0.3:
+        name = f"Snippet{rng.randrange(SNIPPETS)}"
+        lines += [f"import {name} from '/snippets/{name.lower()}.mdx';", "", f"<{name} />", ""]
+    for heading in range(rng.randint(2, 5)):
+        lines += [f"## {prose(rng, 3)[:-1]}", ""]
+        for _ in range(rng.randint(1, 4)):
+            parts = [prose(rng, rng.randint(10, 40))]
+            links = int(density) + (rng.random() < density % 1)
+            parts += [link(rng, routes, sites) for _ in range(links)]
+            lines += [" ".join(parts), ""]
+        if heading % 2:
+            lines += ["```bash", f"curl {rng.choice(sites)}/{rng.choice(routes)}", "```", ""]
+    return "\n".join(lines)
+
+
+def binary(seed: str, size: int) -> bytes:
+    rng = random.Random(seed)
+    return rng.randbytes(size)
+
+
+def commit(repo: Path) -> None:
+    identity = ["-c", "user.name=bench", "-c", "user.email=bench@example.com"]
+    for command in (
+        ["init", "-q", "-b", "main"],
+        ["add", "-A"],
+        [*identity, "commit", "-q", "-m", "Generated corpus"],
+    ):
+        subprocess.run(["git", *command], cwd=repo, check=True)
+
+
+def product_navigation(product: str, routes: list[str], names: list[tuple]) -> dict:
+    """The navigation.products list a product repo declares: its own, plus hrefs."""
+    sections: dict[str, list[str]] = {}
+    for route in routes:
+        sections.setdefault(route.split("/")[0], []).append(route)
+    groups = [
+        {"group": section.replace("-", " ").title(), "root": pages[0], "pages": pages[1:]}
+        for section, pages in sections.items()
+    ]
+    groups.append(
+        {
+            "group": "API",
+            "openapi": "/openapi.json",
+            "pages": [f"GET /items/{i}" for i in range(ENDPOINTS)],
+        }
+    )
+    products = [{"product": BASE_PRODUCT, "href": BASE_SITE}]
+    for name, _, _, site in names:
+        if name == product:
+            products.append({"product": name, "groups": groups})
+        else:
+            products.append({"product": name, "href": site})
+    return {"name": product, "navigation": {"products": products}}
+
+
+def generate_product(
+    root: Path, names: list[tuple], index: int, pages: int, density: float, seed: int
+) -> None:
+    product, repo, _, site = names[index]
+    rng = random.Random(f"{seed}:{repo}")
+    docs = root / "repos" / repo / "docs"
+    routes = page_routes(pages)
+    sites = [BASE_SITE] + [other[3] for other in names]
+
+    for route in routes:
+        path = docs / f"{route}.mdx"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(page(rng, f"{product} {route}", routes, sites, density), encoding="utf-8")
+    (docs / "snippets").mkdir()
+    for i in range(SNIPPETS):
+        text = f"{prose(rng, 12)} {link(rng, routes, sites)}\n"
+        (docs / "snippets" / f"snippet{i}.mdx").write_text(text, encoding="utf-8")
+    (docs / "images").mkdir()
+    for i in range(IMAGES):
+        (docs / "images" / f"figure-{i}.png").write_bytes(binary(f"{seed}:{repo}:{i}", 4096))
+    spec = {
+        "openapi": "3.0.0",
+        "info": {"title": product, "version": "1"},
+        "paths": {
+            f"/items/{i}": {"get": {"responses": {"200": {"description": "ok"}}}}
+            for i in range(ENDPOINTS)
+        },
+    }
+    (docs / "openapi.json").write_text(json.dumps(spec, indent=2) + "\n", encoding="utf-8")
+    (docs / ".mintignore").write_text("drafts/\n", encoding="utf-8")
+    config = product_navigation(product, routes, names)
+    (docs / "docs.json").write_text(json.dumps(config, indent=2) + "\n", encoding="utf-8")
+    commit(root / "repos" / repo)
+
+
+def generate_base(root: Path, names: list[tuple], pages: int, density: float, seed: int) -> None:
+    """The site the products are mounted into, with redirects to each of them."""
+    rng = random.Random(f"{seed}:base")
+    base = root / "base"
+    routes = page_routes(max(1, pages // 4))
+    sites = [BASE_SITE] + [name[3] for name in names]
+    for route in routes:
+        path = base / f"{route}.mdx"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(page(rng, route, routes, sites, density), encoding="utf-8")
+    (base / "index.mdx").write_text(page(rng, "Home", routes, sites, density), encoding="utf-8")
+
+    redirects = [
+        {"source": f"/old/{route}", "destination": f"/{route}"} for route in routes
+    ]
+    for _, _, _, site in names:
+        for route in page_routes(pages)[:: max(1, pages // 50)]:
+            redirects.append({"source": f"/legacy/{route}", "destination": f"{site}/{route}"})
+        redirects.append({"source": "/legacy", "destination": site})
+    home = {"group": "Home", "pages": ["index", *routes]}
+    products = [{"product": BASE_PRODUCT, "groups": [home]}]
+    products += [{"product": product, "href": site} for product, _, _, site in names]
+    config = {"name": BASE_PRODUCT, "navigation": {"products": products}, "redirects": redirects}
+    (base / "docs.json").write_text(json.dumps(config, indent=2) + "\n", encoding="utf-8")
+    # aggregate_docs.py treats the repo it lives in as the base site.
+    (base / "scripts").mkdir()
+    for module in SCRIPT.parent.glob("*.py"):
+        shutil.copy2(module, base / "scripts" / module.name)
+
+
+def generate(root: Path, products: int, pages: int, density: float, seed: int) -> Path:
+    """Write a corpus under root and return the path of its sources.json."""
+    if root.exists():
+        shutil.rmtree(root)
+    names = product_names(products)
+    generate_base(root, names, pages, density, seed)
+    for index in range(products):
+        generate_product(root, names, index, pages, density, seed)
+    sources = [
+        {
+            "product": product,
+            "owner": "bench",
+            "repo": repo,
+            "ref": "main",
+            "subdirectory": "docs",
+            "mount": mount,
+            "site": site,
+        }
+        for product, repo, mount, site in names
+    ]
+    path = root / "sources.json"
+    path.write_text(json.dumps(sources, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+# --------------------------------------------------------------------------- #
+# benchmarks
+# --------------------------------------------------------------------------- #
+
+
+def measure(function, repeat: int, setup=None) -> dict:
+    """Best wall time over `repeat` runs, then the peak allocation of one more.
+
+    tracemalloc slows the code it watches, so memory is taken separately.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        arguments = setup() if setup else ()
+        started = time.perf_counter()
+        function(*arguments)
+        best = min(best, time.perf_counter() - started)
+    arguments = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        function(*arguments)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_kb": peak // 1024}
+
+
+def bench_build(root: Path, sources: Path, extra: list[str]) -> dict:
+    """aggregate_docs.py end to end, with the report it writes about itself."""
+    output, report = root / "build", root / "build-report.json"
+    command = [
+        sys.executable,
+        str(root / "base" / "scripts" / SCRIPT.name),
+        "--output", str(output),
+        "--sources", str(sources),
+        "--use-local", str(root / "repos"),
+        "--report", str(report),
+        *extra,
+    ]
+    started = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if result.returncode:
+        fail(f"aggregate_docs.py failed:\n{result.stderr or result.stdout}")
+    data = json.loads(report.read_text(encoding="utf-8"))
+    shutil.rmtree(output)
+    return {
+        "seconds": round(seconds, 4),
+        "phases": data["phases"],
+        "counters": data["counters"],
+        "peak_rss_kb": data["peak_rss_kb"],
+    }
+
+
+def bench_phases(root: Path, sources: list[dict], repeat: int) -> dict:
+    """The pure phases of the build, summed over every source."""
+    sites = {source["site"]: source["mount"] for source in sources}
+    config = json.loads((root / "base" / "docs.json").read_text(encoding="utf-8"))
+    checkouts = [root / "repos" / source["repo"] / source["subdirectory"] for source in sources]
+    entries = [
+        aggregate.own_product(
+            json.loads((docs / "docs.json").read_text(encoding="utf-8")),
+            source["product"],
+            source["repo"],
+        )
+        for source, docs in zip(sources, checkouts)
+    ]
+    files = [aggregate.plan_tree(docs, aggregate.SOURCE_EXCLUDES)[1] for docs in checkouts]
+    known = [
+        aggregate.addressable_paths(plan, aggregate.navigation_routes(entry, set()))
+        for plan, entry in zip(files, entries)
+    ]
+    scratch = root / "scratch"
+
+    def navigation():
+        for source, entry in zip(sources, entries):
+            aggregate.rewrite_navigation(entry, source["mount"])
+
+    def addressable():
+        for plan, entry in zip(files, entries):
+            aggregate.addressable_paths(plan, aggregate.navigation_routes(entry, set()))
+
+    def fresh_copies():
+        if scratch.exists():
+            shutil.rmtree(scratch)
+        for source, docs in zip(sources, checkouts):
+            aggregate.copy_tree(docs, scratch / source["mount"], aggregate.SOURCE_EXCLUDES)
+        return ()
+
+    def internal_links():
+        for source, routes in zip(sources, known):
+            aggregate.rewrite_internal_links(scratch / source["mount"], source["mount"], routes)
+
+    def redirects():
+        aggregate.internalize_redirects(config.get("redirects", []), sites)
+
+    results = {
+        "rewrite_navigation": measure(navigation, repeat),
+        "addressable_paths": measure(addressable, repeat),
+        "rewrite_internal_links": measure(internal_links, repeat, fresh_copies),
+        "internalize_redirects": measure(redirects, repeat),
+    }
+    shutil.rmtree(scratch)
+    return results
+
+
+def run_tier(
+    name: str, root: Path, products: int, pages: int, args: argparse.Namespace
+) -> dict:
+    log(f"{name}: {products} products x {pages} pages")
+    sources_path = generate(root, products, pages, args.link_density, args.seed)
+    sources = json.loads(sources_path.read_text(encoding="utf-8"))
+    build = bench_build(root, sources_path, args.aggregate_args)
+    log(f"  build {build['seconds']:9.3f}s  peak rss {build['peak_rss_kb'].get('self', '?')} KB")
+    phases = bench_phases(root, sources, args.repeat)
+    for phase, stats in phases.items():
+        log(f"  {phase:<22} {stats['seconds']:9.4f}s  peak {stats['peak_kb']} KB")
+    return {"products": products, "pages": pages, "build": build, "phases": phases}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus = commands.add_parser("corpus", help="generate a corpus and its sources.json")
+    corpus.add_argument("directory", type=Path)
+    corpus.add_argument("--products", type=int, default=3)
+    corpus.add_argument("--pages", type=int, default=100, help="pages per product")
+
+    run = commands.add_parser("run", help="build and time a corpus per size tier")
+    run.add_argument(
+        "--tiers", default="small,medium", help=f"comma-separated, from {', '.join(TIERS)}"
+    )
+    run.add_argument("--products", type=int, help="run one custom tier with this many products")
+    run.add_argument("--pages", type=int, default=100, help="pages per product for --products")
+    run.add_argument("--repeat", type=int, default=3, help="take the best of this many runs")
+    run.add_argument(
+        "--workdir", type=Path, help="keep the corpora here instead of a temporary directory"
+    )
+    run.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    run.add_argument("aggregate_args", nargs="*", help="arguments for aggregate_docs.py, after --")
+
+    for command in (corpus, run):
+        command.add_argument("--link-density", type=float, default=2.0, help="links per paragraph")
+        command.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "corpus":
+        sources = generate(
+            args.directory.resolve(), args.products, args.pages, args.link_density, args.seed
+        )
+        log(f"corpus: {args.products} products x {args.pages} pages, sources in {sources}")
+        return
+
+    if args.products:
+        tiers = {"custom": (args.products, args.pages)}
+    else:
+        unknown = [name for name in args.tiers.split(",") if name not in TIERS]
+        if unknown:
+            fail(f"unknown tier(s): {', '.join(unknown)}")
+        tiers = {name: TIERS[name] for name in args.tiers.split(",")}
+
+    with tempfile.TemporaryDirectory(prefix="bench-aggregate-") as tmp:
+        workdir = args.workdir.resolve() if args.workdir else Path(tmp)
+        results = {
+            name: run_tier(name, workdir / name, products, pages, args)
+            for name, (products, pages) in tiers.items()
+        }
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        log(f"results: wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""A page split into the kinds of text the documentation scripts care about.
+
+Every script that edits or inspects pages needs to know where code is, so it
+can leave samples alone: the migration escapes prose for MDX, and the
+aggregator rewrites, checks and weighs links. parse() splits a page once into
+consecutive segments, each one of
+
+    front_matter   the leading --- block
+    code           a fenced code block, fences included
+    inline_code    a `code` span
+    jsx            a single <Tag ...>, </Tag> or <Tag /> tag
+    prose          everything else
+
+and joining the segments gives back the page exactly. Results are cached by
+text, so the scripts share one parse per page however many passes they make.
+Document.sections() splits a page at its headings instead, which is how the
+graph payload compares two versions of a page.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+
+FRONT_MATTER_RE = re.compile(r"---[ \t]*\r?\n.*?\n---[ \t]*(?:\r?\n|\Z)", re.S)
+# A whole fence line, with its line break.
+FENCE_LINE_RE = re.compile(r"^[ \t]*(`{3,}|~{3,})[^\n]*(?:\n|\Z)", re.M)
+# Inline code never spans lines; a stray backtick must not swallow a paragraph.
+SPAN_RE = re.compile(
+    r"(?P<inline_code>(?P<ticks>`+)(?:(?!(?P=ticks))[^\n])*(?P=ticks))"
+    r"|(?P<jsx></?[A-Za-z][\w.:-]*(?:\s[^<>]*)?/?>)"
+)
+
+# Segment kinds whose text is code, which rewrites and checks leave alone.
+CODE = frozenset({"code", "inline_code"})
+# Segment kinds that can't hold a heading.
+NOT_HEADINGS = frozenset({"front_matter", "code"})
+
+# An ATX heading: its level (the #s) and its text, without any closing #s.
+# Only meaningful outside code, e.g. on Document.blanked().
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class Document:
+    segments: tuple[tuple[str, str], ...]
+
+    @property
+    def text(self) -> str:
+        return "".join(text for _, text in self.segments)
+
+    @property
+    def front_matter(self) -> str:
+        kind, text = self.segments[0] if self.segments else ("", "")
+        return text if kind == "front_matter" else ""
+
+    @property
+    def code_blocks(self) -> int:
+        return sum(1 for kind, _ in self.segments if kind == "code")
+
+    def runs(self, skip: frozenset[str] = CODE) -> list[tuple[bool, str]]:
+        """The text as maximal runs of segments outside / inside `skip`."""
+        runs: list[tuple[bool, str]] = []
+        for kind, text in self.segments:
+            editable = kind not in skip
+            if runs and runs[-1][0] == editable:
+                runs[-1] = (editable, runs[-1][1] + text)
+            else:
+                runs.append((editable, text))
+        return runs
+
+    def map(self, function: Callable[[str], str], skip: frozenset[str] = CODE) -> str:
+        """The text with function applied to every run outside `skip`."""
+        return "".join(function(text) if editable else text for editable, text in self.runs(skip))
+
+    def sections(self) -> list[tuple[int, str, str]]:
+        """The text split at every heading outside front matter and code blocks.
+
+        Each section is (level, heading, text) and runs from its heading to
+        the next one of any level. Whatever precedes the first heading, front
+        matter included, is a section of level 0 with no heading, left out if
+        empty. Joining the texts gives back the page exactly.
+        """
+        sections: list[tuple[int, str, list[str]]] = [(0, "", [])]
+        # Each run starts a line: code blocks and front matter end with one.
+        for editable, text in self.runs(NOT_HEADINGS):
+            cursor = 0
+            if editable:
+                for match in HEADING_RE.finditer(text):
+                    sections[-1][2].append(text[cursor : match.start()])
+                    sections.append((len(match.group(1)), match.group(2), []))
+                    cursor = match.start()
+            sections[-1][2].append(text[cursor:])
+        return [
+            (level, heading, "".join(texts))
+            for level, heading, texts in sections
+            if level or any(texts)
+        ]
+
+    def blanked(self) -> str:
+        """The text with code removed, keeping every line where it was."""
+        return "".join(
+            "\n" * text.count("\n") if kind in CODE else text for kind, text in self.segments
+        )
+
+
+def heading_slug(heading: str) -> str:
+    """The anchor Mintlify gives a heading (GitHub-style)."""
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", heading)
+    text = re.sub(r"<[^>]+>|[`*~]", "", text).strip().lower()
+    return re.sub(r"[^\w\- ]", "", text).replace(" ", "-")
+
+
+def split_spans(text: str, segments: list[tuple[str, str]]) -> None:
+    """Append the inline code, JSX tag and prose segments of a stretch of prose."""
+    if not text:
+        return
+    if "`" not in text and "<" not in text:
+        segments.append(("prose", text))
+        return
+    cursor = 0
+    for match in SPAN_RE.finditer(text):
+        if match.start() > cursor:
+            segments.append(("prose", text[cursor : match.start()]))
+        segments.append((match.lastgroup, match.group(0)))
+        cursor = match.end()
+    if cursor < len(text):
+        segments.append(("prose", text[cursor:]))
+
+
+@lru_cache(maxsize=512)
+def parse(text: str) -> Document:
+    segments: list[tuple[str, str]] = []
+    front_matter = FRONT_MATTER_RE.match(text)
+    if front_matter:
+        segments.append(("front_matter", front_matter.group(0)))
+    body = text[front_matter.end() :] if front_matter else text
+
+    # Fences follow protect_and_escape's long-standing rules: a block closes at
+    # the next fence of the same character that is at least as long. Only
+    # fence lines are visited; everything between them is sliced out whole.
+    fence: str | None = None
+    start = 0
+    for match in FENCE_LINE_RE.finditer(body):
+        marker = match.group(1)
+        if fence is None:
+            split_spans(body[start : match.start()], segments)
+            fence, start = marker[0] * len(marker), match.start()
+        elif marker[0] == fence[0] and len(marker) >= len(fence):
+            segments.append(("code", body[start : match.end()]))
+            fence, start = None, match.end()
+    if fence is not None:  # an unclosed fence runs to the end of the page
+        segments.append(("code", body[start:]))
+    else:
+        split_spans(body[start:], segments)
+    return Document(tuple(segments))
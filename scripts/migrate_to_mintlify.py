@@ -23,6 +23,8 @@ import sys
 
 import yaml
 
+from mdx_document import parse
+
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Directories that hold documentation pages. Everything else is left alone.
@@ -236,8 +238,7 @@ def drop_leading_h1(body: str) -> str:
 # MDX safety
 # --------------------------------------------------------------------------- #
 
-FENCE_RE = re.compile(r"^(\s*)(`{3,}|~{3,})(.*)$")
-INLINE_CODE_RE = re.compile(r"(`+)(?:(?!\1).)*\1", re.S)
+INLINE_CODE_RE = re.compile(r"(`+)(?:(?!\1).)*\1")
 STYLE_RE = re.compile(r'style="([^"]*)"')
 TAG_OPEN_RE = re.compile(r"<(/?)([A-Za-z][A-Za-z0-9._-]*)")
 
@@ -283,36 +284,29 @@ def escape_mdx(text: str) -> str:
     return text
 
 
-def protect_and_escape(body: str) -> str:
-    """Apply MDX escaping to prose only, leaving code blocks untouched."""
-    out: list[str] = []
-    fence: str | None = None
-    for line in body.split("\n"):
-        match = FENCE_RE.match(line)
-        if match:
-            marker = match.group(2)
-            if fence is None:
-                fence = marker[0] * len(marker)
-                out.append(line)
-                continue
-            if marker[0] == fence[0] and len(marker) >= len(fence):
-                fence = None
-                out.append(line)
-                continue
-        if fence is not None:
-            out.append(line)
-            continue
+def escape_line(line: str) -> str:
+    """Escape one line of prose, keeping its inline-code spans as they are."""
+    pieces: list[str] = []
+    cursor = 0
+    for span in INLINE_CODE_RE.finditer(line):
+        pieces.append(fix_html(escape_mdx(line[cursor:span.start()])))
+        pieces.append(span.group(0))
+        cursor = span.end()
+    pieces.append(fix_html(escape_mdx(line[cursor:])))
+    return "".join(pieces)
 
-        # Split the line into inline-code spans (kept) and prose (escaped).
-        pieces: list[str] = []
-        cursor = 0
-        for span in INLINE_CODE_RE.finditer(line):
-            pieces.append(fix_html(escape_mdx(line[cursor:span.start()])))
-            pieces.append(span.group(0))
-            cursor = span.end()
-        pieces.append(fix_html(escape_mdx(line[cursor:])))
-        out.append("".join(pieces))
-    return "\n".join(out)
+
+def protect_and_escape(body: str) -> str:
+    """Apply MDX escaping to prose only, leaving code blocks untouched.
+
+    Fenced blocks come from the shared document model. The rest is escaped
+    line by line, as it always has been: a tag or style attribute that
+    spans lines is left as written.
+    """
+    return parse(body).map(
+        lambda prose: "\n".join(escape_line(line) for line in prose.split("\n")),
+        skip=frozenset({"code"}),
+    )
 
 
 # --------------------------------------------------------------------------- #
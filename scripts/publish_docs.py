@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Publish an aggregated build as a new commit on the `docs-site` branch.
+
+Instead of committing the whole build as a fresh root commit and force-pushing
+it, this fetches only the commit and trees of the current branch tip (no file
+contents), stages the build on top of that tree, and pushes a child commit. Git
+hashes every file locally, so unchanged files are never uploaded, and the push
+only carries the blobs that actually changed.
+
+Usage:
+    python3 scripts/publish_docs.py --build build
+    python3 scripts/publish_docs.py --build build --repository FalkorDB/docs --dry-run
+    python3 scripts/publish_docs.py --build build --remote file:///srv/git
+
+Authenticates with DOCS_TOKEN (or GITHUB_TOKEN) like aggregate_docs.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from aggregate_docs import GITHUB, MANIFEST, fail, git_auth, log, remote_url, run_git
+
+BRANCH = "docs-site"
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "FalkorDB Docs Bot",
+    "GIT_AUTHOR_EMAIL": "docs-bot@falkordb.com",
+    "GIT_COMMITTER_NAME": "FalkorDB Docs Bot",
+    "GIT_COMMITTER_EMAIL": "docs-bot@falkordb.com",
+}
+# Paths listed one by one in the commit message; beyond this, just counted.
+LISTED_PATHS = 50
+STATUS_NAMES = {"A": "added", "M": "modified", "D": "deleted", "T": "retyped"}
+
+
+def git(git_dir: Path, *args: str, env: dict | None = None) -> str:
+    """Run a local git command against git_dir and return its output."""
+    proc = subprocess.run(
+        ["git", "--git-dir", str(git_dir), *args],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **(env or {})},
+    )
+    if proc.returncode:
+        fail(f"git {args[0]}: {proc.stderr.strip() or f'exit {proc.returncode}'}")
+    return proc.stdout.strip()
+
+
+def remote_tip(url: str, branch: str, auth: list[str]) -> str | None:
+    """The commit the branch points at, or None if it does not exist yet."""
+    proc = subprocess.run(
+        ["git", *auth, "ls-remote", "--heads", url, branch],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        fail(f"ls-remote {branch}: {proc.stderr.strip() or f'exit {proc.returncode}'}")
+    for line in proc.stdout.splitlines():
+        sha, ref = line.split("\t")
+        if ref == f"refs/heads/{branch}":
+            return sha
+    return None
+
+
+def summarize(changes: list[tuple[str, str]]) -> str:
+    """A commit message body listing what changed, compactly."""
+    counts = Counter(status for status, _ in changes)
+    lines = [
+        f"{len(changes)} paths changed: "
+        + ", ".join(f"{counts[s]} {name}" for s, name in STATUS_NAMES.items() if counts[s])
+    ]
+    lines.append("")
+    lines += [f"{status} {path}" for status, path in changes[:LISTED_PATHS]]
+    if len(changes) > LISTED_PATHS:
+        lines.append(f"... and {len(changes) - LISTED_PATHS} more")
+    return "\n".join(lines)
+
+
+def publish(
+    build: Path, url: str, branch: str, message: str, dry_run: bool = False
+) -> str | None:
+    """Commit build on top of the branch and push it. Returns the new commit, if any."""
+    auth = git_auth(url)
+    with tempfile.TemporaryDirectory(prefix="publish-") as tmp:
+        git_dir = Path(tmp) / "site.git"
+        git(git_dir, "init", "--quiet", "--bare")
+        parent = remote_tip(url, branch, auth)
+
+        index = {"GIT_INDEX_FILE": str(Path(tmp) / "index")}
+        if parent:
+            # Commits and trees only: comparing against them needs no file contents.
+            run_git(
+                ["git", "--git-dir", str(git_dir), *auth, "fetch", "--quiet", "--depth", "1",
+                 "--filter=blob:none", url, f"refs/heads/{branch}:refs/published"],
+                f"fetch {branch}",
+            )
+            parent = git(git_dir, "rev-parse", "refs/published")
+            git(git_dir, "read-tree", parent, env=index)
+        stage = ["--work-tree", str(build), "add", "--all", "--", ".", f":!{MANIFEST}"]
+        git(git_dir, *stage, env=index)
+        tree = git(git_dir, "write-tree", env=index)
+
+        if parent:
+            if tree == git(git_dir, "rev-parse", f"{parent}^{{tree}}"):
+                log(f"publish: {branch} is already up to date at {parent[:7]}")
+                return None
+            diff = git(git_dir, "diff-tree", "-r", "--no-renames", "--name-status", parent, tree)
+        else:
+            diff = git(git_dir, "ls-tree", "-r", "--name-only", tree)
+            diff = "\n".join(f"A\t{path}" for path in diff.splitlines())
+        changes = [tuple(line.split("\t", 1)) for line in diff.splitlines()]
+        body = summarize(changes)
+        log(f"publish: {body.splitlines()[0]}")
+
+        command = ["commit-tree", tree, "-m", message, "-m", body]
+        if parent:
+            command[2:2] = ["-p", parent]
+        commit = git(git_dir, *command, env=IDENTITY)
+        if dry_run:
+            log(f"publish: would push {commit[:7]} to {branch} (dry run)")
+            return commit
+        run_git(
+            ["git", "--git-dir", str(git_dir), *auth, "push", "--quiet", url,
+             f"{commit}:refs/heads/{branch}"],
+            f"push {branch}",
+        )
+        log(f"publish: pushed {commit[:7]} to {branch}")
+        return commit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--build", default="build", help="the aggregated site to publish")
+    parser.add_argument("--branch", default=BRANCH)
+    parser.add_argument(
+        "--repository",
+        default=os.environ.get("GITHUB_REPOSITORY", "FalkorDB/docs"),
+        help="owner/name of the repository to push to (default: $GITHUB_REPOSITORY)",
+    )
+    parser.add_argument(
+        "--remote",
+        default=GITHUB,
+        help=f"base URL the repository lives under (default: {GITHUB})",
+    )
+    parser.add_argument("--message", help="commit subject (default: names the source commit)")
+    parser.add_argument("--dry-run", action="store_true", help="commit, but do not push")
+    args = parser.parse_args()
+
+    build = Path(args.build).resolve()
+    if not (build / "docs.json").is_file():
+        fail(f"{build} is not a built site (no docs.json)")
+    owner, _, repo = args.repository.partition("/")
+    message = args.message
+    if not message:
+        sha = os.environ.get("GITHUB_SHA", "")[:7] or "local build"
+        run = os.environ.get("GITHUB_RUN_NUMBER")
+        message = f"Aggregate docs from {sha}" + (f" (run {run})" if run else "")
+    publish(build, remote_url(owner, repo, args.remote), args.branch, message, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""A compact full-text index of the aggregated site, and the API to query it.
+
+aggregate_docs.py --search-index writes one file covering every page's title,
+headings and prose (code is left out), with postings keyed by the page's
+route in the deployed site. Consumers load it with mmap and look terms up
+without re-crawling or re-parsing anything:
+
+    with SearchIndex("search-index.bin") as index:
+        for route, title, score in index.search("vector index"):
+            ...
+
+The file is laid out so a lookup only touches what it needs:
+
+    header         magic, version, counts and section offsets
+    term offsets   uint32 per term, into the term blob (plus an end offset)
+    posting offs   uint32 per term, into the posting blob (plus an end offset)
+    term blob      the terms, UTF-8, sorted, so lookups are binary searches
+    postings       per term, varint pairs of (page id gap, tf << 3 | fields)
+    pages          zlib-compressed JSON list of [route, title]
+
+Usage:
+    python3 scripts/search_index.py build/search-index.bin "graph algorithms"
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import re
+import struct
+import sys
+import zlib
+from collections import Counter
+
+from mdx_document import HEADING_RE, parse
+
+MAGIC = b"FDSI"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIIIII")
+OFFSET = struct.Struct("<I")
+# An entry's offset and the next one, which is where the entry ends.
+SPAN = struct.Struct("<II")
+
+# Where on a page a term occurs, packed into the low bits of its posting.
+TITLE, HEADING, PROSE = 4, 2, 1
+FIELD_BITS = 3
+# How much an occurrence in each field counts towards a page's score.
+FIELD_WEIGHTS = {TITLE: 6.0, HEADING: 3.0, PROSE: 1.0}
+
+TITLE_RE = re.compile(r"""^title:\s*["']?(.*?)["']?\s*$""", re.MULTILINE)
+# Link and image targets are addresses, not words; their text is kept.
+LINK_TARGET_RE = re.compile(r"\]\([^)]*\)")
+URL_RE = re.compile(r"https?://\S+")
+TOKEN_RE = re.compile(r"[^\W_]+(?:['_][^\W_]+)*")
+# Single characters are noise; anything longer than this is an identifier or hash.
+MIN_TOKEN, MAX_TOKEN = 2, 40
+
+
+def tokens(text: str) -> list[str]:
+    return [
+        token
+        for token in TOKEN_RE.findall(text.lower())
+        if MIN_TOKEN <= len(token) <= MAX_TOKEN
+    ]
+
+
+def page_terms(text: str) -> tuple[str, dict[str, int]]:
+    """A page's title, and its terms with their postings value (tf << 3 | fields)."""
+    document = parse(text)
+    title = TITLE_RE.search(document.front_matter)
+    title = title.group(1) if title else ""
+    prose = "".join(text for kind, text in document.segments if kind == "prose")
+    prose = URL_RE.sub(" ", LINK_TARGET_RE.sub("]", prose))
+    headings = [heading for _, heading in HEADING_RE.findall(prose)]
+
+    counts: Counter[str] = Counter()
+    fields: dict[str, int] = {}
+    for field, text in (
+        (TITLE, title),
+        (HEADING, "\n".join(headings)),
+        (PROSE, HEADING_RE.sub("", prose)),
+    ):
+        for token in tokens(text):
+            counts[token] += 1
+            fields[token] = fields.get(token, 0) | field
+    return title, {term: count << FIELD_BITS | fields[term] for term, count in counts.items()}
+
+
+def varint(value: int, out: bytearray) -> None:
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_index(path, pages: list[tuple[str, str, dict[str, int]]]) -> tuple[int, int]:
+    """Write the index of (route, title, terms) pages to path.
+
+    Returns how many terms it holds and its size in bytes.
+    """
+    pages = sorted(pages, key=lambda page: page[:2])
+    postings: dict[str, bytearray] = {}
+    last: dict[str, int] = {}
+    for page, (_, _, terms) in enumerate(pages):
+        for term, value in terms.items():
+            out = postings.setdefault(term, bytearray())
+            varint(page - last.get(term, 0), out)
+            varint(value, out)
+            last[term] = page
+
+    terms = sorted(postings)
+    term_offsets, posting_offsets = [0], [0]
+    term_blob, posting_blob = bytearray(), bytearray()
+    for term in terms:
+        term_blob += term.encode("utf-8")
+        posting_blob += postings[term]
+        term_offsets.append(len(term_blob))
+        posting_offsets.append(len(posting_blob))
+    table = json.dumps([[route, title] for route, title, _ in pages], ensure_ascii=False)
+
+    offsets = struct.pack(f"<{len(terms) + 1}I", *term_offsets)
+    offsets += struct.pack(f"<{len(terms) + 1}I", *posting_offsets)
+    terms_at = HEADER.size + len(offsets)
+    postings_at = terms_at + len(term_blob)
+    pages_at = postings_at + len(posting_blob)
+    header = HEADER.pack(
+        MAGIC, VERSION, len(pages), len(terms), HEADER.size, terms_at, postings_at, pages_at
+    )
+    data = header + offsets + term_blob + posting_blob + zlib.compress(table.encode(), 9)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(terms), len(data)
+
+
+class SearchIndex:
+    """A search index file, mapped into memory rather than read."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, pages, terms, offsets_at, self.terms_at, self.postings_at, pages_at = (
+            HEADER.unpack_from(self.data)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} search index")
+        self.terms = terms
+        self.term_offsets = offsets_at
+        self.posting_offsets = offsets_at + OFFSET.size * (terms + 1)
+        self.pages = json.loads(zlib.decompress(self.data[pages_at:]))
+
+    def __enter__(self) -> SearchIndex:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.data.close()
+
+    def span(self, table: int, i: int) -> tuple[int, int]:
+        """Where entry i of an offset table starts and ends, relative to its blob."""
+        return SPAN.unpack_from(self.data, table + OFFSET.size * i)
+
+    def term(self, i: int) -> bytes:
+        start, end = self.span(self.term_offsets, i)
+        return self.data[self.terms_at + start : self.terms_at + end]
+
+    def find(self, term: str) -> int | None:
+        """The position of term in the sorted term table, by binary search."""
+        key = term.encode("utf-8")
+        low, high = 0, self.terms
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.terms and self.term(low) == key else None
+
+    def postings(self, term: str) -> list[tuple[int, int]]:
+        """(page id, tf << 3 | fields) for every page containing term."""
+        i = self.find(term)
+        if i is None:
+            return []
+        start, end = self.span(self.posting_offsets, i)
+        data = self.data[self.postings_at + start : self.postings_at + end]
+        postings, numbers, value, shift = [], [], 0, 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                numbers.append(value)
+                value, shift = 0, 0
+        page = 0
+        for gap, packed in zip(numbers[::2], numbers[1::2]):
+            page += gap
+            postings.append((page, packed))
+        return postings
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, str, float]]:
+        """(route, title, score) of the best pages containing every word of query."""
+        scores: dict[int, float] | None = None
+        for term in dict.fromkeys(tokens(query)):
+            postings = self.postings(term)
+            idf = math.log(1 + len(self.pages) / (1 + len(postings)))
+            found = {}
+            for page, packed in postings:
+                fields = packed & (1 << FIELD_BITS) - 1
+                weight = sum(w for field, w in FIELD_WEIGHTS.items() if fields & field)
+                found[page] = (weight + math.log1p(packed >> FIELD_BITS)) * idf
+            if scores is None:
+                scores = found
+            else:
+                scores = {page: scores[page] + found[page] for page in scores.keys() & found}
+            if not scores:
+                return []
+        ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+        return [(*self.pages[page], round(score, 3)) for page, score in ranked[:limit]]
+
+
+def main() -> None:
+    if len(sys.argv) != 3:
+        sys.exit(f"usage: {sys.argv[0]} INDEX QUERY")
+    with SearchIndex(sys.argv[1]) as index:
+        for route, title, score in index.search(sys.argv[2]):
+            print(f"{score:8.3f}  {route}  {title}")
+
+
+if __name__ == "__main__":
+    main()